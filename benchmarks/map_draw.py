@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""Per frame cost of drawing the map terrain, the way it used to be done
+(scan an over sized rhombus, one Vector2 and blit per tile) against the
+analytic visible range with a single blits call, with and without the
+chunk cache.
+
+    python -m benchmarks.map_draw [frames]
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from pygame.math import Vector2
+
+from isogame.ecs import init_game
+from isogame.display import Camera
+from isogame.utils import diagonal_box_iter
+
+
+def legacy_draw(game):
+    _map = game.map
+    cam = game.camera.get_component(Camera)
+    cam_iso = game.camera.position
+    cam_x, cam_y = (int(cam_iso.x), int(cam_iso.y))
+    cam_size_x, cam_size_y = (
+        int(cam.size.x / _map.tile_size.x),
+        int(cam.size.y / _map.tile_size.y)
+    )
+
+    cam_x -= cam_size_x // 2
+    cam_y -= int(cam_size_y * 1.5)
+
+    drawn = 0
+    for lx, ly, x, y in diagonal_box_iter(
+        cam_x, cam_y - 2, cam_size_x * 2, (cam_size_y * 2) + 5):
+
+        if (x < 0 or x >= _map.iso_size_x or
+            y < 0 or y >= _map.iso_size_y):
+            continue
+
+        world_pos = _map.iso_to_cartesian(
+            Vector2(x, y)
+        ) + cam.get_draw_delta()
+
+        game.display.screen.blit(
+            _map.tiles[_map.map_data[x][y]],
+            world_pos
+        )
+        drawn += 1
+
+    return drawn
+
+
+def bench(name, frames, draw, tiles):
+    draw()  # warm up caches
+    begin = time.perf_counter()
+    for _ in range(frames):
+        draw()
+    frame_ms = (time.perf_counter() - begin) / frames * 1000
+    print(
+        f'{name:>8}: {frame_ms:8.3f} ms/frame '
+        f'{(frame_ms * 1000) / tiles:8.3f} us/tile ({tiles} tiles)'
+    )
+
+
+def main(frames: int = 200):
+    game = init_game()
+    _map = game.map
+    _map.raw_draw()  # resolves the camera
+
+    draw_delta = _map._cam.get_draw_delta()
+    visible = len(_map.visible_tiles(draw_delta, game.display.size))
+    scanned = legacy_draw(game)
+    print(f'visible tiles: {visible}, legacy blits: {scanned}')
+
+    bench('legacy', frames, lambda: legacy_draw(game), visible)
+    bench('tiles', frames, lambda: _map.draw_tiles(draw_delta), visible)
+    bench('chunks', frames, _map.raw_draw, visible)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
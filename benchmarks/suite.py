@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+"""Timings of the engine hot paths, run on SDL's dummy video driver so
+no window is needed.
+
+    python -m benchmarks.suite run [--out results.json] [--filter text]
+    python -m benchmarks.suite compare baseline.json results.json
+
+``run`` prints a table and writes the results as JSON, ``compare`` exits
+with status 1 when a benchmark got slower than the baseline by more
+than the threshold (10% by default). Save a ``run`` from the commit to
+compare against as the baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import statistics
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from pygame.math import Vector2
+
+from isogame.ecs import init_game, Level, Component, Prototype, on_call
+from isogame.noise import FractalNoise
+from isogame.map import Map, Minimap
+from isogame.humanoid import Humanoid
+
+
+# name: (setup, calls per sample), setup(game) returns the callable to time
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int = 1):
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return decorator
+
+
+class Ticker(Component):
+
+    def __init__(self, entity):
+        super().__init__(entity)
+        self.ticks = 0
+
+    @on_call('update')
+    def tick(self):
+        self.ticks += 1
+
+
+@benchmark('noise.tile_ids 256x256')
+def bench_noise(game):
+    noise = FractalNoise(1234, octaves=3)
+    return lambda: noise.tile_ids(0, 0, 256, 256, 20)
+
+
+@benchmark('map.generate 50x50', number=5)
+def bench_map_generate(game):
+    # a whole Map, noise, tile grid and chunk setup
+
+    def generate():
+        entity = game.level.spawn('bench-map')
+        entity.add_component(Map, 50, 50, 64, seed=1234)
+        game.level.destroy('bench-map')
+
+    return generate
+
+
+@benchmark('map.raw_draw', number=20)
+def bench_map_draw(game):
+    return game.map.raw_draw
+
+
+@benchmark('map.draw_tiles', number=5)
+def bench_map_draw_tiles(game):
+    _map = game.map
+    _map.raw_draw()  # resolves the camera
+    draw_delta = _map._cam.get_draw_delta()
+    return lambda: _map.draw_tiles(draw_delta)
+
+
+@benchmark('minimap.raw_draw', number=50)
+def bench_minimap_draw(game):
+    minimap = game.minimap.get_component(Minimap)
+    minimap.raw_draw()  # builds the terrain cache
+    return minimap.raw_draw
+
+
+def _spawn_humanoids(game, amount: int):
+    humanoids = game.level.spawn_many(
+        Prototype('bench').add(Humanoid, Vector2(0)), amount)
+
+    rng = random.Random(0)
+    cam = game.camera.position
+    for entity in humanoids:
+        entity.position = cam + Vector2(
+            rng.uniform(-10, 10), rng.uniform(-10, 10))
+        entity.prev_position = entity.position
+
+    return humanoids
+
+
+@benchmark('display.present full, 500 humanoids', number=5)
+def bench_present_full(game):
+    _spawn_humanoids(game, 500)
+
+    def frame():
+        game.display.invalidate()
+        game.frame()
+
+    return frame
+
+
+@benchmark('display.present idle, 500 humanoids', number=20)
+def bench_present_idle(game):
+    _spawn_humanoids(game, 500)
+    game.frame()
+    return game.frame
+
+
+@benchmark('input.update', number=200)
+def bench_input(game):
+    return game.input.update
+
+
+@benchmark('level.spawn_many 1000', number=5)
+def bench_spawn(game):
+    prototype = Prototype('ticker').add(Ticker)
+
+    def spawn():
+        level = Level()
+        level.spawn_many(prototype, 1000)
+
+    return spawn
+
+
+@benchmark('level.spawn 1000', number=5)
+def bench_spawn_one_by_one(game):
+
+    def spawn():
+        level = Level()
+        for i in range(1000):
+            level.spawn(f'ticker-{i}').add_component(Ticker)
+
+    return spawn
+
+
+@benchmark('level.perform_calls 10000', number=20)
+def bench_perform_calls(game):
+    level = Level()
+    level.spawn_many(Prototype('ticker').add(Ticker), 10000)
+    return lambda: level.perform_calls('update')
+
+
+@benchmark('game.tick, 10000 idle entities', number=20)
+def bench_tick(game):
+    # entities nothing moves shouldn't cost anything per tick
+    game.level.spawn_many(Prototype('bench'), 10000)
+    return game.tick
+
+
+def measure(fn, number: int, repeat: int) -> dict:
+    fn()  # warm up caches
+
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - begin) / number * 1000)
+
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'mean_ms': statistics.fmean(samples),
+        'stdev_ms': statistics.stdev(samples) if len(samples) > 1 else 0.,
+        'number': number,
+        'repeat': repeat
+    }
+
+
+def run(names, repeat: int) -> dict:
+    random.seed(0)
+    game = init_game()
+
+    results = {}
+    for name in names:
+        setup, number = BENCHMARKS[name]
+        results[name] = measure(setup(game), number, repeat)
+
+        # don't let entities spawned by one benchmark slow down the next
+        game.level.destroy_many([
+            entity for entity in game.level.entities
+            if entity.startswith('bench-')
+        ])
+        game.display.invalidate()
+
+        print(
+            f'{name:<40} {results[name]["median_ms"]:10.3f} ms '
+            f'(min {results[name]["min_ms"]:.3f})'
+        )
+
+    pygame.quit()
+
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """(name, baseline ms, current ms, ratio) of every benchmark in both,
+    printed with the ones past the threshold flagged. Returns the
+    regressions.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:<40} {"":>10}    {result["median_ms"]:10.3f} ms  new')
+            continue
+
+        ratio = result['median_ms'] / base['median_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(
+                (name, base['median_ms'], result['median_ms'], ratio))
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+
+        print(
+            f'{name:<40} {base["median_ms"]:10.3f} -> '
+            f'{result["median_ms"]:10.3f} ms {ratio:6.2f}x  {flag}'
+        )
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('--out', default='benchmarks.json')
+    run_parser.add_argument('--repeat', type=int, default=7)
+    run_parser.add_argument(
+        '--filter', default='', help='only benchmarks with this in the name')
+
+    compare_parser = commands.add_parser('compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        names = [name for name in BENCHMARKS if args.filter in name]
+        results = run(names, args.repeat)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f'{len(regressions)} regression(s) past {args.threshold:.0%}')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
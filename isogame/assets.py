@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import pygame
+
+from pygame import Surface
+
+from .atlas import Atlas
+
+
+class Assets:
+    """Images loaded once and shared, converted to the display pixel
+    format as soon as there is a display so blits don't convert on the fly.
+
+    Callers must not draw onto the surfaces they get, copy them first.
+    """
+
+    def __init__(self, workers: int = 2):
+        self._images: Dict[tuple, Surface] = {}
+        self._atlases: Dict[str, Atlas] = {}
+
+        # decoded images, conversion waits for the main thread and the
+        # display. Kept so the other alpha mode converts from them instead
+        # of decoding the file again.
+        self._decoded: Dict[str, Surface] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._workers = workers
+        self._pool = None
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def _decode(self, path: str) -> Surface:
+        surf = pygame.image.load(path)
+        with self._lock:
+            self._decoded[path] = surf
+        return surf
+
+    def image(self, path: str, alpha: bool = True) -> Surface:
+        """Shared surface for the image at path, alpha False drops the
+        alpha channel which blits faster for opaque images.
+        """
+        key = (path, alpha)
+        surf = self._images.get(key)
+        if surf is not None:
+            return surf
+
+        future = self._pending.pop(path, None)
+        if future is not None:
+            future.result()
+
+        with self._lock:
+            surf = self._decoded.get(path)
+        if surf is None:
+            surf = self._decode(path)
+
+        # only converted surfaces get shared, before there's a display
+        # callers get the decoded one and the next call converts it
+        if pygame.display.get_surface() is None:
+            return surf
+
+        surf = surf.convert_alpha() if alpha else surf.convert()
+        self._images[key] = surf
+        return surf
+
+    def atlas(self, path: str) -> Atlas:
+        """Shared atlas for the index at path, see ``isogame.atlas``
+        """
+        atlas = self._atlases.get(path)
+        if atlas is None:
+            atlas = Atlas(self, path)
+            self._atlases[path] = atlas
+
+        return atlas
+
+    def preload(self, paths: Iterable[str]) -> Future:
+        """Decode images on background threads, the returned future is
+        done once all of them are.
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._workers)
+
+        futures = []
+        for path in paths:
+            if (path, True) in self._images or (path, False) in self._images:
+                continue
+
+            with self._lock:
+                if path in self._decoded:
+                    continue
+
+            if path not in self._pending:
+                self._pending[path] = self._pool.submit(self._decode, path)
+            futures.append(self._pending[path])
+
+        done = Future()
+        if not futures:
+            done.set_result(None)
+            return done
+
+        remaining = [len(futures)]
+
+        def finished(_):
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                done.set_result(None)
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+        return done
+
+    def preload_manifest(self, path: str) -> Future:
+        """Preload every image listed in a json manifest, shaped like
+        ``{"images": ["res/tile_medium.png", ...]}``
+        """
+        with open(path) as f:
+            manifest = json.load(f)
+
+        return self.preload(manifest.get('images', []))
+
+    def clear(self):
+        self._images.clear()
+        self._atlases.clear()
+        with self._lock:
+            self._decoded.clear()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
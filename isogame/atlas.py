@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+"""Sprite sheets packed offline, one image plus a json index of the
+rects of every frame in it.
+
+    python -m isogame.atlas [res/atlas.json] [name=pattern ...]
+
+Each name gets the frames matching its pattern, patterns with ``%d``
+take frames 0, 1, ... for as long as the files exist, the way
+``res/blender/utils.rotate_and_render`` names its renders. Without
+sources the default set below gets packed.
+"""
+
+import os
+import sys
+import json
+
+from typing import Dict, List, Tuple
+
+import pygame
+
+from pygame import Rect, Surface
+
+
+# name: pattern of the frames packed by default
+DEFAULT_SOURCES = {
+    'humanoid': 'res/humanoid_medium.png',
+    'humanoid_render': 'res/blender/render%d.png',
+    'tile_large': 'res/tile.png',
+    'tile_medium': 'res/tile_medium.png',
+    'tile_small': 'res/tile_small.png',
+}
+
+
+def frame_paths(pattern: str) -> List[str]:
+    if '%d' not in pattern:
+        return [pattern]
+
+    paths = []
+    while os.path.exists(pattern % len(paths)):
+        paths.append(pattern % len(paths))
+
+    return paths
+
+
+def pack(
+    sizes: List[Tuple[int, int]],
+    padding: int = 4
+) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+    """Shelf packing, tallest first, returns the sheet size and where each
+    of the sizes goes in it. Padding keeps frames from bleeding into each
+    other when the sheet gets scaled, 4 leaves a pixel between them at
+    the smallest zoom level.
+    """
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    width = max([w + padding for w, _ in sizes] + [1])
+
+    # a roughly square sheet
+    sheet_width = 1
+    while sheet_width * sheet_width < area or sheet_width < width:
+        sheet_width *= 2
+
+    positions = [None] * len(sizes)
+    x = y = shelf = 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[i]
+        if x + w > sheet_width:
+            x, y = 0, y + shelf + padding
+            shelf = 0
+
+        positions[i] = (x, y)
+        x += w + padding
+        shelf = max(shelf, h)
+
+    return (sheet_width, y + shelf), positions
+
+
+def build(sources: Dict[str, str], index_path: str, padding: int = 4) -> dict:
+    """Pack the frames of the sources into a png next to index_path and
+    write the index, returns the index.
+    """
+    names = []
+    images = []
+    for name, pattern in sources.items():
+        paths = frame_paths(pattern)
+        if not paths:
+            raise FileNotFoundError(f'no frames for {name}: {pattern}')
+
+        for path in paths:
+            names.append(name)
+            images.append(pygame.image.load(path))
+
+    size, positions = pack([image.get_size() for image in images], padding)
+
+    sheet = Surface(size, pygame.SRCALPHA)
+    sheet.fill((0, 0, 0, 0))
+    sprites = {}
+    for name, image, pos in zip(names, images, positions):
+        sheet.blit(image, pos)
+        sprites.setdefault(name, []).append([*pos, *image.get_size()])
+
+    image_path = os.path.splitext(index_path)[0] + '.png'
+    pygame.image.save(sheet, image_path)
+
+    index = {
+        'image': os.path.basename(image_path),
+        'size': list(size),
+        'sprites': sprites
+    }
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+
+    return index
+
+
+class Atlas:
+    """Runtime side of a packed sheet, one shared surface and the rects
+    of the frames of every sprite in it. Blit ``surface`` with a frame as
+    the area, or take a ``subsurface`` for code that wants a Surface.
+
+    ``mip`` gives the same for the sheet scaled to a camera zoom level.
+    """
+
+    def __init__(self, assets, index_path: str):
+        with open(index_path) as f:
+            index = json.load(f)
+
+        self.path = index_path
+        self.image_path = os.path.join(
+            os.path.dirname(index_path), index['image'])
+        self.surface = assets.image(self.image_path)
+
+        self.sprites: Dict[str, List[Rect]] = {
+            name: [Rect(frame) for frame in frames]
+            for name, frames in index['sprites'].items()
+        }
+
+        # (surface, sprites) per zoom level, level 0 is the sheet itself
+        self._mips = [(self.surface, self.sprites)]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sprites
+
+    def frames(self, name: str) -> List[Rect]:
+        return self.sprites[name]
+
+    def frame(self, name: str, index: int = 0) -> Rect:
+        return self.sprites[name][index]
+
+    def mip(self, level: int) -> Tuple[Surface, Dict[str, List[Rect]]]:
+        """Sheet and frame rects at a zoom level of ``ZOOM_LEVELS``,
+        each level halves the one before, made once and kept
+        """
+        while len(self._mips) <= level:
+            surface, sprites = self._mips[-1]
+            width, height = surface.get_size()
+            self._mips.append((
+                pygame.transform.smoothscale(
+                    surface, (max(1, width // 2), max(1, height // 2))),
+                {
+                    name: [
+                        Rect(rect.x // 2, rect.y // 2,
+                             max(1, rect.w // 2), max(1, rect.h // 2))
+                        for rect in frames
+                    ]
+                    for name, frames in sprites.items()
+                }
+            ))
+
+        return self._mips[level]
+
+    def subsurface(self, name: str, index: int = 0) -> Surface:
+        """Frame as a Surface sharing the sheet's pixels
+        """
+        return self.surface.subsurface(self.sprites[name][index])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    index_path = 'res/atlas.json'
+    if argv and '=' not in argv[0]:
+        index_path, argv = argv[0], argv[1:]
+
+    sources = dict(arg.split('=', 1) for arg in argv) or DEFAULT_SOURCES
+
+    index = build(sources, index_path)
+    frames = sum(len(frames) for frames in index['sprites'].values())
+    print(
+        f'{frames} frames of {len(index["sprites"])} sprites packed into '
+        f'{index["image"]} {index["size"][0]}x{index["size"][1]}'
+    )
+
+
+if __name__ == '__main__':
+    main()
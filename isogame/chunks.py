@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+from typing import Callable
+
+from pygame import Surface
+
+
+def surface_bytes(surf: Surface) -> int:
+    return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+
+class ChunkCache:
+    """LRU cache of pre-rendered chunk surfaces keyed by chunk coords.
+    Chunks can also be cached at other zoom levels, all levels share the
+    same memory cap.
+
+    render: called as ``render(cx, cy)`` on a cache miss, or as
+    ``render(cx, cy, level)`` for levels other than 0, must return the
+    finished chunk surface
+    max_bytes: pixel memory cap, least recently used chunks get dropped
+    once the total goes above it
+    """
+
+    def __init__(
+        self,
+        render: Callable[[int, int], Surface],
+        max_bytes: int
+    ):
+        self.render = render
+        self.max_bytes = max_bytes
+
+        self.bytes = 0
+        self._chunks: 'OrderedDict[tuple, Surface]' = OrderedDict()
+        self._levels = set()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, key: tuple) -> bool:
+        """key is (cx, cy) for level 0, (cx, cy, level) for the others
+        """
+        return key in self._chunks
+
+    def get(self, cx: int, cy: int, level: int = 0) -> Surface:
+        key = (cx, cy, level) if level else (cx, cy)
+        surf = self._chunks.get(key)
+        if surf is not None:
+            self._chunks.move_to_end(key)
+            return surf
+
+        if level:
+            self._levels.add(level)
+        surf = self.render(*key)
+        self._chunks[key] = surf
+        self.bytes += surface_bytes(surf)
+        self._evict()
+        return surf
+
+    def invalidate(self, cx: int, cy: int):
+        """Drop the chunk at every level
+        """
+        for key in [(cx, cy)] + [(cx, cy, level) for level in self._levels]:
+            surf = self._chunks.pop(key, None)
+            if surf is not None:
+                self.bytes -= surface_bytes(surf)
+
+    def clear(self):
+        self._chunks.clear()
+        self._levels.clear()
+        self.bytes = 0
+
+    def _evict(self):
+        # never drop the chunk we just rendered, even if it alone is
+        # over the cap
+        while self.bytes > self.max_bytes and len(self._chunks) > 1:
+            _, surf = self._chunks.popitem(last=False)
+            self.bytes -= surface_bytes(surf)
@@ -1,17 +1,40 @@
 #!/usr/bin/env python3
 
 from abc import abstractmethod
+from math import floor
+from time import perf_counter
+from operator import itemgetter
+from typing import List, Optional, Tuple
 
+import numpy as np
 import pygame
 
-from pygame import Surface
+from pygame import Rect, Surface
 from pygame.math import Vector2
 
-from sortedcontainers import SortedList
-
 from .ecs import Entity, Component, on_call
 
 
+# render layers, drawn bottom to top, depth only orders drawables inside
+# a layer so it has to stay under the stride
+LAYER_TERRAIN = 0
+LAYER_ENTITIES = 1
+LAYER_UI = 2
+LAYER_OVERLAY = 3
+
+LAYER_STRIDE = float(1 << 32)
+
+
+def order_key(layer: int, depth: float = 0.) -> float:
+    return layer * LAYER_STRIDE + depth
+
+
+# camera zoom levels, each half the one before so every pre-scaled level
+# of tiles, chunks and sprites can be made from the last one and lands on
+# whole pixels
+ZOOM_LEVELS = (1., .5, .25)
+
+
 class Camera(Component):
 
     def __init__(
@@ -24,33 +47,109 @@ class Camera(Component):
         self.size = size
         self.scroll_speed = 600 
 
+        # pixels past the screen edges entities still get drawn from, as
+        # sprites stick out of the point they stand on
+        self.cull_margin = 128
+
         self.map = self.game.map
 
+        # index into ZOOM_LEVELS, only discrete levels so everything
+        # drawn can have pre-scaled images for each
+        self.zoom_level = 0
+
+        self.game.display.camera = self
+
+        self._offset_key = None
+        self._offset = (0, 0)
+
+    @property
+    def zoom(self) -> float:
+        return ZOOM_LEVELS[self.zoom_level]
+
+    def set_zoom_level(self, level: int):
+        level = min(max(level, 0), len(ZOOM_LEVELS) - 1)
+        if level != self.zoom_level:
+            self.zoom_level = level
+            self.game.display.invalidate()
+
+    def draw_offset(self) -> Tuple[int, int]:
+        """Same as ``get_draw_delta`` as a tuple, only worked out again
+        when the camera moves so sprites can ask for it every frame.
+        """
+        pos = self.entity.lerp_position(self.game.alpha)
+        key = (pos.x, pos.y, self.zoom_level)
+        if key != self._offset_key:
+            # whole pixels, so everything drawn relative to the camera
+            # moves by the same amount and a scrolled frame matches a
+            # redrawn one
+            delta = -(
+                self.map.iso_to_cartesian(pos) * self.zoom - (self.size / 2))
+            self._offset_key = key
+            self._offset = (floor(delta.x), floor(delta.y))
+
+        return self._offset
+
     def get_draw_delta(self) -> Vector2:
-        return -(
-            self.map.iso_to_cartesian(self.entity.position) -
-            (self.size / 2)
+        return Vector2(self.draw_offset())
+
+    def visible_diamond(self) -> Tuple[float, float, float, float]:
+        """(u_begin, u_end, v_begin, v_end) in x + y, y - x iso space of
+        the screen grown by ``cull_margin``, see ``SpatialHash.diamond``
+        """
+        dx, dy = self.draw_offset()
+        size = self.map.cartesian_size * self.zoom
+        margin = self.cull_margin
+        return (
+            2 * (-margin - dx) / size,
+            2 * (self.size.x + margin - dx) / size,
+            4 * (-margin - dy) / size,
+            4 * (self.size.y + margin - dy) / size
         )
 
+    def screen_to_iso(self, points: np.ndarray) -> np.ndarray:
+        """Iso coords of an (N, 2) array of screen points
+        """
+        delta = self.get_draw_delta()
+        return self.map.cartesian_to_iso_array(
+            (np.asarray(points, dtype=np.float64) - (delta.x, delta.y)) /
+            self.zoom)
+
+    def pick_tiles(self, points: np.ndarray) -> np.ndarray:
+        """Coords of the tiles under an (N, 2) array of screen points
+        """
+        delta = self.get_draw_delta()
+        return self.map.pick_tiles(
+            (np.asarray(points, dtype=np.float64) - (delta.x, delta.y)) /
+            self.zoom)
+
     @on_call('update')
     def scroll_cam(self):
+        # same speed on screen at every zoom
         self.entity.position += self.map.cartesian_to_iso(
-            self.game.input.axis * self.scroll_speed * self.game.delta)
+            self.game.input.axis * self.scroll_speed * self.game.delta /
+            self.zoom)
 
-        if self.entity.position.x < 0:
-            self.entity.position.x = 0
+        # maps without edges stream in chunks wherever the camera goes
+        if not self.map.bounded:
+            return
 
-        if self.entity.position.x > self.map.iso_size_x:
-            self.entity.position.x = self.map.iso_size_x
+        # assigned as a whole so the level index sees it
+        pos = self.entity.position
+        if not (0 <= pos.x <= self.map.iso_size_x and
+                0 <= pos.y <= self.map.iso_size_y):
+            self.entity.position = Vector2(
+                min(max(pos.x, 0), self.map.iso_size_x),
+                min(max(pos.y, 0), self.map.iso_size_y)
+            )
 
-        if self.entity.position.y < 0:
-            self.entity.position.y = 0
 
-        if self.entity.position.y > self.map.iso_size_y:
-            self.entity.position.y = self.map.iso_size_y
+class Drawable(Component):
 
+    # drawables whose whole image moves with the camera, the display
+    # shifts their last frame instead of redrawing it when it pans
+    scrolls = False
 
-class Drawable(Component):
+    layer = LAYER_ENTITIES
 
     def __init__(
         self,
@@ -59,32 +158,309 @@ class Drawable(Component):
         super().__init__(entity)
         self.display = self.game.display
 
-    @abstractmethod
-    def get_order_value(self) -> int:
-        ...
+    def get_order_value(self) -> float:
+        """Sort key used when draw gets no order, drawn lowest first
+        """
+        return self.layer * LAYER_STRIDE
 
     @abstractmethod
     def raw_draw(self):
         ...
 
+    def get_rect(self) -> Optional[Rect]:
+        """Screen area raw_draw will cover this frame, None if unknown
+        which makes the display redraw the whole screen.
+        """
+        return None
+
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """Union overlapping rects until none overlap
+    """
+    merged = []
+    for rect in rects:
+        rect = Rect(rect)
+        while True:
+            hits = rect.collidelistall(merged)
+            if not hits:
+                break
+
+            rect.unionall_ip([merged[i] for i in hits])
+            for i in reversed(hits):
+                del merged[i]
+
+        merged.append(rect)
+
+    return merged
+
 
 class Display:
 
-    def __init__(self):
+    def __init__(self, dirty_rects: bool = False, headless: bool = False):
         self.size = Vector2(1280, 720)
-        self.screen = pygame.display.set_mode(
-            (int(self.size.x), int(self.size.y)))
-        self.renderlist = SortedList(
-            key=lambda x: x.get_order_value())
 
-    def draw(self, obj: Drawable):
-        self.renderlist.add(obj)
+        # headless displays never open a window, screen stays None and
+        # nothing should get presented
+        self.headless = headless
+        self.screen = None
+        if not headless:
+            self.screen = pygame.display.set_mode(
+                (int(self.size.x), int(self.size.y)))
 
-    def present(self):
-        self.screen.fill((0, 0, 0))
-        
-        for obj in self.renderlist:
+        # (order, drawable, sprite) as they get submitted, sorted once on
+        # present, as everything submits in about the same order every
+        # frame the sort is close to linear. Sprites are (surface, pos) or
+        # (surface, pos, area) queued through blit and have no drawable.
+        self.renderlist = []
+
+        # with dirty rects on, present scrolls the last frame by how much
+        # the camera moved and only redraws the exposed strips plus the
+        # areas non scrolling drawables covered last frame and this one
+        self.dirty_rects = dirty_rects
+        self.camera = None
+
+        # set by Game.profile while profiling
+        self.profiler = None
+
+        self._prev_delta = None
+        self._prev_rects = {}
+        self._prev_sprites = set()
+        self._run_orders = {}
+        self._invalid = []
+        self._invalid_all = True
+
+    def draw(self, obj: Drawable, order: Optional[float] = None):
+        """Queue a drawable for this frame, order is a key made by
+        ``order_key``, if None ``obj.get_order_value()`` gets called.
+        """
+        self.renderlist.append(
+            (obj.get_order_value() if order is None else order, obj, None))
+
+    def blit(
+        self,
+        surf: Surface,
+        pos: Tuple[float, float],
+        order: float,
+        area: Optional[Rect] = None
+    ):
+        """Queue a sprite for this frame, sprites next to each other in
+        the sorted queue get drawn with a single ``blits`` call. area is
+        the part of surf to draw, a frame of an atlas.
+        """
+        self.renderlist.append(
+            (order, None, (surf, pos) if area is None else (surf, pos, area)))
+
+    def _sorted(self) -> list:
+        """Drawables in order with runs of consecutive sprites merged in
+        lists of (surface, pos[, area])
+        """
+        start = perf_counter()
+        self.renderlist.sort(key=itemgetter(0))
+
+        # order of every sprite of a run, by id of the run, as sprites
+        # that swap places have to be redrawn
+        self._run_orders = {}
+
+        steps = []
+        run = None
+        for order, obj, sprite in self.renderlist:
+            if obj is not None:
+                steps.append(obj)
+                run = None
+
+            elif run is None:
+                run = [sprite]
+                steps.append(run)
+                orders = self._run_orders[id(run)] = [order]
+
+            else:
+                run.append(sprite)
+                orders.append(order)
+
+        if self.profiler is not None:
+            self.profiler.record('renderlist.sort', 'sort', start)
+
+        return steps
+
+    def _raw_draw(self, obj: Drawable):
+        if self.profiler is None:
             obj.raw_draw()
+            return
+
+        start = perf_counter()
+        obj.raw_draw()
+        self.profiler.record(
+            self.profiler.name(type(obj), 'raw_draw'), 'raw_draw', start)
+
+    def _blits(self, sprites: list):
+        if self.profiler is None:
+            self.screen.blits(sprites, doreturn=False)
+            return
+
+        start = perf_counter()
+        self.screen.blits(sprites, doreturn=False)
+        self.profiler.record('sprites', 'raw_draw', start)
+
+    def _draw_steps(self, steps: list):
+        for step in steps:
+            if type(step) is list:
+                self._blits(step)
+            else:
+                self._raw_draw(step)
+
+    def _update(self, rects: Optional[List[Rect]] = None):
+        start = perf_counter()
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+        if self.profiler is not None:
+            self.profiler.record(
+                'display.flip' if rects is None else 'display.update',
+                'present', start)
+
+    def invalidate(self, rect: Optional[Rect] = None):
+        """Force an area (the whole screen if None) to be redrawn next
+        frame, for drawables that change without moving.
+        """
+        if rect is None:
+            self._invalid_all = True
+        else:
+            self._invalid.append(Rect(rect))
+
+    def present(self):
+        steps = self._sorted()
+
+        if self.dirty_rects:
+            self._present_dirty(steps)
+
+        else:
+            self.screen.fill((0, 0, 0))
+            self._draw_steps(steps)
+            self._update()
 
-        pygame.display.flip()
         self.renderlist.clear()
+
+    def _present_dirty(self, steps: list):
+        # drawables can invalidate while they draw, say for a chunk that
+        # isn't there yet, that has to go to the next frame
+        invalid, invalid_all = self._invalid, self._invalid_all
+        self._invalid = []
+        self._invalid_all = False
+
+        width, height = self.screen.get_size()
+        delta = (
+            self.camera.get_draw_delta() if self.camera else Vector2(0))
+
+        rects = {
+            step: step.get_rect()
+            for step in steps
+            if type(step) is not list and not step.scrolls
+        }
+
+        # sprites are keyed by what they show, where and their order, as
+        # they come and go every frame and overlapping ones can swap
+        run_rects = {
+            id(step): [
+                Rect(sprite[1],
+                     sprite[2].size if len(sprite) > 2 else sprite[0].get_size())
+                for sprite in step
+            ]
+            for step in steps if type(step) is list
+        }
+        sprites = {
+            (id(sprite[0]), *(sprite[2][:2] if len(sprite) > 2 else (0, 0)),
+             *rect, order)
+            for step in steps if type(step) is list
+            for sprite, rect, order in zip(
+                step, run_rects[id(step)], self._run_orders[id(step)])
+        }
+
+        full = (
+            invalid_all or
+            self._prev_delta is None or
+            None in rects.values()
+        )
+
+        if not full:
+            dx = int(delta.x - self._prev_delta.x)
+            dy = int(delta.y - self._prev_delta.y)
+            full = abs(dx) >= width or abs(dy) >= height
+
+        if full:
+            self.screen.set_clip(None)
+            self.screen.fill((0, 0, 0))
+            self._draw_steps(steps)
+            self._update()
+
+        else:
+            dirty = invalid
+
+            if dx or dy:
+                self.screen.scroll(dx, dy)
+
+                if dx > 0:
+                    dirty.append(Rect(0, 0, dx, height))
+                elif dx < 0:
+                    dirty.append(Rect(width + dx, 0, -dx, height))
+
+                if dy > 0:
+                    dirty.append(Rect(0, 0, width, dy))
+                elif dy < 0:
+                    dirty.append(Rect(0, height + dy, width, -dy))
+
+            # what was under a drawable last frame moved with the scroll
+            for obj, rect in rects.items():
+                prev = self._prev_rects.pop(obj, None)
+                if prev is not None:
+                    prev = prev.move(dx, dy)
+
+                if prev != rect or dx or dy:
+                    dirty.append(rect)
+                    if prev is not None:
+                        dirty.append(prev)
+
+            # drawables that didn't show up this frame
+            for prev in self._prev_rects.values():
+                dirty.append(prev.move(dx, dy))
+
+            # sprites live in the world, the scroll already moved the ones
+            # that stayed put to the right place
+            prev_sprites = {
+                (surf_id, area_x, area_y, x + dx, y + dy, w, h, order)
+                for surf_id, area_x, area_y, x, y, w, h, order
+                in self._prev_sprites
+            }
+            for _, _, _, x, y, w, h, _ in sprites ^ prev_sprites:
+                dirty.append(Rect(x, y, w, h))
+
+            screen_rect = self.screen.get_rect()
+            dirty = merge_rects([
+                rect.clip(screen_rect) for rect in dirty
+                if rect.colliderect(screen_rect)
+            ])
+
+            for area in dirty:
+                self.screen.set_clip(area)
+                self.screen.fill((0, 0, 0))
+
+                for step in steps:
+                    if type(step) is list:
+                        hits = area.collidelistall(run_rects[id(step)])
+                        if hits:
+                            self._blits([step[i] for i in hits])
+                        continue
+
+                    rect = rects.get(step)
+                    if rect is None or rect.colliderect(area):
+                        self._raw_draw(step)
+
+            self.screen.set_clip(None)
+
+            if dirty:
+                self._update(dirty)
+
+        self._prev_delta = delta
+        self._prev_rects = rects
+        self._prev_sprites = sprites
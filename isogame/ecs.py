@@ -1,22 +1,30 @@
 #!/usr/bin/env python3
 
-import uuid
+import random
 import traceback
 
 from abc import ABC
-from time import time
-from uuid import UUID
-from typing import Dict, List, Callable
+from time import perf_counter, sleep
+from itertools import count
+from operator import attrgetter
+from typing import (
+    Dict, Iterable, Iterator, List, Optional, Set, Tuple, Callable)
 
 import pygame
 
 from pygame.math import Vector2
 
+from .spatial import SpatialHash
+
 
 class CallAlreadyAssignedError(BaseException):
     ...
 
 
+class ComponentAlreadyAddedError(BaseException):
+    ...
+
+
 def on_call(flag: str):
     def decorator(func):
         if hasattr(func, 'call_flag'):
@@ -27,6 +35,34 @@ def on_call(flag: str):
     return decorator
 
 
+_CALL_HANDLERS: Dict[type, List[Tuple[str, str]]] = {}
+
+
+def call_handlers(comp_type: type) -> List[Tuple[str, str]]:
+    """(flag, method name) of every ``on_call`` method of a component
+    class, sorted by name like ``dir`` does. Worked out once per class.
+    """
+    handlers = _CALL_HANDLERS.get(comp_type)
+    if handlers is not None:
+        return handlers
+
+    names = set()
+    for base in comp_type.__mro__:
+        names.update(vars(base))
+
+    handlers = []
+    for name in sorted(names):
+        if name.startswith('__'):
+            continue
+
+        flag = getattr(getattr(comp_type, name, None), 'call_flag', None)
+        if flag:
+            handlers.append((flag, name))
+
+    _CALL_HANDLERS[comp_type] = handlers
+    return handlers
+
+
 class Component(ABC):
     
     def __init__(
@@ -35,89 +71,554 @@ class Component(ABC):
     ):
         self.entity = entity
         self.game = game_state()
-       
-        methods = [
-            getattr(self, attr)
-            for attr in dir(self)
-            if (callable(getattr(self, attr)) and 
-                not attr.startswith('__'))
+
+    def reset(self, *args, **kwargs):
+        """Get a pooled component ready for a new entity, ``spawn_many``
+        calls it with the prototype args instead of building a new one.
+        Runs ``__init__`` again by default.
+        """
+        self.__init__(self.entity, *args, **kwargs)
+
+
+class Archetype:
+    """Every entity with the exact same set of component types. Each
+    type gets a column (a list of components) and an entity is a row
+    across all of them, so all the components of one type are stored
+    next to each other and can be walked without going through entities.
+    """
+
+    def __init__(self, types: Tuple[type, ...]):
+        self.types = types
+        self.entities: List['Entity'] = []
+        self.columns: Dict[type, List[Component]] = {
+            comp_type: [] for comp_type in types}
+
+        self._resolved: Dict[type, Optional[list]] = {}
+        # types more than one stored type is a subclass of
+        self.ambiguous: Set[type] = set()
+        self._flag_calls: Dict[str, List[Tuple[list, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def column(self, comp_type) -> Optional[list]:
+        """Column of the first stored type that is comp_type or a subclass
+        of it, None if there's none. ``Entity`` gives the entities column.
+
+        Stored types are in the order the first entity of the archetype
+        got them, when more than one matches comp_type it's in
+        ``ambiguous`` and ``Entity.get_component`` goes by the order each
+        entity got its components in instead.
+        """
+        try:
+            return self._resolved[comp_type]
+        except KeyError:
+            pass
+
+        column = None
+        if comp_type is Entity:
+            column = self.entities
+
+        else:
+            for stored_type in self.types:
+                if issubclass(stored_type, comp_type):
+                    if column is not None:
+                        self.ambiguous.add(comp_type)
+                        break
+                    column = self.columns[stored_type]
+
+        self._resolved[comp_type] = column
+        return column
+
+    def calls(self, flag: str) -> List[Tuple[list, str]]:
+        """(column, method name) of the handlers for flag, in the order
+        ``perform_calls`` would run them for a single entity.
+        """
+        calls = self._flag_calls.get(flag)
+        if calls is None:
+            calls = [
+                (self.columns[comp_type], name)
+                for comp_type in self.types
+                for handler_flag, name in call_handlers(comp_type)
+                if handler_flag == flag
+            ]
+            self._flag_calls[flag] = calls
+
+        return calls
+
+    def append(self, entity: 'Entity', components: Dict[type, Component]) -> int:
+        self.entities.append(entity)
+        for comp_type, column in self.columns.items():
+            column.append(components[comp_type])
+
+        return len(self.entities) - 1
+
+    def extend(self, entities: List['Entity'], components: List[Dict[type, Component]]):
+        """Append many rows at once, sets the row of each entity
+        """
+        first = len(self.entities)
+        self.entities.extend(entities)
+        for comp_type, column in self.columns.items():
+            column.extend(row[comp_type] for row in components)
+
+        for row, entity in enumerate(entities, first):
+            entity._row = row
+
+    def remove(self, row: int) -> Dict[type, Component]:
+        """Take a row out by moving the last one into its place, returns
+        the components that were on it.
+        """
+        components = {
+            comp_type: column[row]
+            for comp_type, column in self.columns.items()
+        }
+
+        last = self.entities.pop()
+        for column in self.columns.values():
+            moved = column.pop()
+            if row < len(column):
+                column[row] = moved
+
+        if row < len(self.entities):
+            self.entities[row] = last
+            last._row = row
+
+        return components
+
+    def remove_many(self, rows: Iterable[int]) -> List[Dict[type, Component]]:
+        """Take many rows out in one pass over the table, returns their
+        components in the order rows were given, the remaining rows keep
+        their order.
+        """
+        rows = list(rows)
+        removed = [
+            {comp_type: column[row] for comp_type, column in self.columns.items()}
+            for row in rows
         ]
 
-        for fn in methods:
-            flag = getattr(fn, 'call_flag', None)
-            if flag:
-                if flag not in self.entity._on_call:
-                    self.entity._on_call[flag] = []
+        dropped = set(rows)
+        keep = [
+            row for row in range(len(self.entities)) if row not in dropped]
+        self.entities[:] = [self.entities[row] for row in keep]
+        for column in self.columns.values():
+            column[:] = [column[row] for row in keep]
+
+        for row, entity in enumerate(self.entities):
+            entity._row = row
+
+        return removed
+
+
+class Prototype:
+    """Components to give each entity made by ``Level.spawn_many``, added
+    in order with the same args ``add_component`` would take.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.components: List[Tuple[type, tuple, dict]] = []
+
+    def add(self, component, *args, **kwargs) -> 'Prototype':
+        self.components.append((component, args, kwargs))
+        return self
 
-                self.entity._on_call[flag].append(fn)
+    @property
+    def types(self) -> Tuple[type, ...]:
+        return tuple(comp_type for comp_type, _, _ in self.components)
 
 
 class Entity:
 
+    __slots__ = (
+        'level', 'name', 'id',
+        '_position', '_prev', '_moved', '_archetype', '_row', '_building',
+        '_types'
+    )
+
     def __init__(
         self,
         level,
-        name: str
+        name: str,
+        archetype: Optional[Archetype] = None
     ):
         self.level = level
         self.name = name
-        self.id = uuid.uuid4()
-       
+        self.id = next(level.ids)
+
+        self._position = Vector2()
+        self._prev = Vector2()
+        self._moved = level.ticks
         self.position = Vector2()
-        self.components: List[Component] = []
 
-        self._on_call = {}
+        self._archetype = (
+            archetype if archetype is not None else level.archetype(()))
+        self._row = -1
+
+        # component types in the order they were added
+        self._types = self._archetype.types
+
+        # components made so far while spawn_many builds the entity, it
+        # only gets a row once they're all done
+        self._building: Optional[Dict[type, Component]] = None
+
+    @property
+    def position(self) -> Vector2:
+        # a copy, changing it in place doesn't move the entity. Every
+        # move goes through the setter so the level index and
+        # prev_position can't miss one, += still works.
+        return Vector2(self._position)
+
+    @position.setter
+    def position(self, pos: Vector2):
+        # the first move in a tick keeps the position the tick started
+        # from, entities that don't move cost nothing per tick
+        if self._moved != self.level.ticks:
+            self._prev.update(self._position)
+            self._moved = self.level.ticks
+        self._position = Vector2(pos)
+        self.level.index.update(self, self._position)
+
+    @property
+    def prev_position(self) -> Vector2:
+        """Position before the last tick, the current one if it didn't
+        move since
+        """
+        if self._moved != self.level.ticks:
+            return Vector2(self._position)
+        return Vector2(self._prev)
+
+    @prev_position.setter
+    def prev_position(self, pos: Vector2):
+        self._prev = Vector2(pos)
+        self._moved = self.level.ticks
+
+    def lerp_position(self, alpha: float) -> Vector2:
+        """Position between the one before the last tick and the current
+        one, what gets drawn when frames fall in between ticks.
+        """
+        if alpha >= 1 or self._moved != self.level.ticks:
+            return Vector2(self._position)
+
+        return self._prev.lerp(self._position, alpha)
+
+    @property
+    def components(self) -> List[Component]:
+        if self._row < 0:
+            # pooled entities have no row, and no components either
+            return list(self._building.values()) if self._building else []
+
+        return [
+            self._archetype.columns[comp_type][self._row]
+            for comp_type in self._types
+        ]
 
     def get_component(self, comp_type) -> Component:
-        for comp in self.components:
-            if isinstance(comp, comp_type):
-                return comp
+        if self._row < 0:
+            if self._building:
+                for stored_type, component in self._building.items():
+                    if issubclass(stored_type, comp_type):
+                        return component
+            return None
+
+        archetype = self._archetype
+        column = archetype.column(comp_type)
+        if column is None:
+            return None
+
+        # more than one of its components is a comp_type, the one added
+        # first wins like it always did
+        if comp_type in archetype.ambiguous:
+            for stored_type in self._types:
+                if issubclass(stored_type, comp_type):
+                    return archetype.columns[stored_type][self._row]
+
+        return column[self._row]
 
     def add_component(self, component, *args, **kwargs) -> Component:
+        if component in self._archetype.columns:
+            raise ComponentAlreadyAddedError
+
         new_comp = component(self, *args, **kwargs)
-        self.components.append(new_comp)
+
+        # move the entity over to the archetype with the new type
+        components = self._archetype.remove(self._row)
+        components[component] = new_comp
+        self._types += (component,)
+        self._archetype = self.level.archetype(self._types)
+        self._row = self._archetype.append(self, components)
+
+        self.level.add_calls(new_comp)
+
         return new_comp
 
+    def cleanup(self) -> Dict[type, Component]:
+        """Take the entity out of its archetype, returns its components
+        """
+        components = self._archetype.remove(self._row)
+        self._row = -1
+        return components
+
 
 class Level:
 
-    def __init__(self):
+    def __init__(self, pool_size: int = 4096):
         self.entities: Dict[str, Entity] = {}
+        self.ids = count()
+
+        # where every entity is, for region queries and culling
+        self.index = SpatialHash()
+
+        # destroyed entities with their components, by archetype, waiting
+        # to be handed out again by spawn_many
+        self.pool_size = pool_size
+        self._pool: Dict[frozenset, List[Tuple[Entity, Dict[type, Component]]]] = {}
+
+        self._archetypes: Dict[frozenset, Archetype] = {}
+        self._queries: Dict[tuple, List[Tuple[list, ...]]] = {}
+
+        # bound on_call methods of every component by flag, in the order
+        # components got added
+        self._calls: Dict[str, List[Callable]] = {}
+
+        # set by Game.profile while profiling
+        self.profiler = None
+
+        # ticks run so far, entities keep their position from before the
+        # current tick the first time it gets looked at
+        self.ticks = 0
+
+    def archetype(self, types: Tuple[type, ...]) -> Archetype:
+        key = frozenset(types)
+        archetype = self._archetypes.get(key)
+        if archetype is None:
+            archetype = Archetype(types)
+            self._archetypes[key] = archetype
+
+            # a new archetype can match queries that were already cached
+            self._queries.clear()
+
+        return archetype
+
+    def query(self, *types) -> Iterator[tuple]:
+        """Iterate a tuple with one component of each type for every
+        entity that has all of them, pass ``Entity`` as a type to get the
+        entity too. Columns are zipped archetype by archetype, so don't
+        add or remove components while iterating. A base type more than
+        one component of an entity is a subclass of gives the same one
+        for every entity of the archetype, see ``Archetype.column``.
+        """
+        matches = self._queries.get(types)
+        if matches is None:
+            matches = []
+            for archetype in self._archetypes.values():
+                columns = tuple(archetype.column(t) for t in types)
+                if None not in columns:
+                    matches.append(columns)
+
+            self._queries[types] = matches
+
+        for columns in matches:
+            yield from zip(*columns)
+
+    def add_calls(self, component: Component):
+        for flag, name in call_handlers(type(component)):
+            self._calls.setdefault(flag, []).append(getattr(component, name))
+
+    def remove_calls(self, components: List[Component]):
+        """Drop the handlers of every given component, one pass per flag
+        whatever the amount of components.
+        """
+        removed = {id(comp) for comp in components}
+        flags = {
+            flag
+            for comp in components
+            for flag, _ in call_handlers(type(comp))
+        }
+        for flag in flags:
+            self._calls[flag] = [
+                fn for fn in self._calls[flag]
+                if id(fn.__self__) not in removed
+            ]
 
     def perform_calls(self, flag: str):
-        for entity in self.entities.values():
-            if flag not in entity._on_call:
-                continue
-
-            for fn in entity._on_call[flag]:
-                fn()
+        if self.profiler is not None:
+            self._perform_calls_profiled(flag)
+            return
+
+        for fn in self._calls.get(flag, ()):
+            fn()
+
+    def perform_calls_for(self, flag: str, entities: Iterable[Entity]):
+        """Run the flag handlers of only the given entities, in that order
+        """
+        profiler = self.profiler
+        begin = perf_counter() if profiler is not None else None
+
+        for entity in entities:
+            row = entity._row
+            for column, name in entity._archetype.calls(flag):
+                getattr(column[row], name)()
+
+        if profiler is not None:
+            profiler.record(flag, 'culled', begin)
+
+    def _perform_calls_profiled(self, flag: str):
+        # one span per component class and method, the time of all their
+        # calls added up and laid end to end from the start of the pass
+        profiler = self.profiler
+        totals: Dict[tuple, float] = {}
+        begin = last = perf_counter()
+        for fn in self._calls.get(flag, ()):
+            fn()
+            now = perf_counter()
+            key = (type(fn.__self__), fn.__name__)
+            totals[key] = totals.get(key, 0.) + now - last
+            last = now
+
+        start = begin
+        for (comp_type, method), total in totals.items():
+            profiler.record(
+                profiler.name(comp_type, method), flag, start, start + total)
+            start += total
+
+        profiler.record(flag, 'flag', begin)
 
     def spawn(self, name: str):
-        self.entities[name] = Entity(self, name)
-        return self.entities[name] 
+        entity = Entity(self, name)
+        entity._row = entity._archetype.append(entity, {})
+        self.entities[name] = entity
+        return entity
+
+    def spawn_many(self, prototype: Prototype, amount: int) -> List[Entity]:
+        """Spawn amount entities with the components of prototype, named
+        ``{prototype.name}-{id}``. Entities go straight into their final
+        archetype, components being built get the siblings made before
+        them from the entity. Pooled entities get reused first.
+        """
+        types = prototype.types
+        archetype = self.archetype(types)
+        pool = self._pool.get(frozenset(types), [])
+
+        spawned = []
+        rows = []
+        for _ in range(amount):
+            if pool:
+                entity, components = pool.pop()
+                entity.id = next(self.ids)
+                entity.position = Vector2()
+                entity.prev_position = Vector2()
+                entity._building = components
+                for comp_type, args, kwargs in prototype.components:
+                    components[comp_type].reset(*args, **kwargs)
+
+            else:
+                # components see the siblings made before them, like they
+                # would through add_component
+                entity = Entity(self, None, archetype)
+                components = entity._building = {}
+                for comp_type, args, kwargs in prototype.components:
+                    components[comp_type] = comp_type(entity, *args, **kwargs)
+
+            # don't take the name of an entity spawned by hand
+            entity._types = types
+            entity.name = f'{prototype.name}-{entity.id}'
+            while entity.name in self.entities:
+                entity.id = next(self.ids)
+                entity.name = f'{prototype.name}-{entity.id}'
+            self.entities[entity.name] = entity
+            spawned.append(entity)
+            rows.append(components)
+
+        archetype.extend(spawned, rows)
+        for entity in spawned:
+            entity._building = None
+
+        for comp_type in types:
+            for flag, name in call_handlers(comp_type):
+                self._calls.setdefault(flag, []).extend(
+                    getattr(row[comp_type], name) for row in rows)
+
+        return spawned
 
     def destroy(self, name: str):
-        self.entities[name].cleanup()
-        del self.entities[name]
+        self.destroy_many([name])
+
+    def destroy_many(self, names: Iterable[str]):
+        """Destroy entities by name, keeping them around in the pool
+        """
+        entities = [self.entities.pop(name) for name in names]
+        self.remove_calls([
+            comp for entity in entities for comp in entity.components])
+
+        for entity in entities:
+            self.index.remove(entity)
+
+        by_archetype: Dict[Archetype, List[Entity]] = {}
+        for entity in entities:
+            by_archetype.setdefault(entity._archetype, []).append(entity)
+
+        for archetype, group in by_archetype.items():
+            # past a few rows one pass over the table beats swapping
+            # rows out one by one
+            if len(group) > 16:
+                removed = archetype.remove_many(
+                    entity._row for entity in group)
+            else:
+                removed = [entity.cleanup() for entity in group]
+
+            pool = self._pool.setdefault(frozenset(archetype.types), [])
+            for entity, components in zip(group, removed):
+                entity._row = -1
+                if len(pool) < self.pool_size:
+                    pool.append((entity, components))
 
 
 class Game:
+    """tick_rate: simulation steps per second, update systems always see
+    the same delta
+    max_fps: cap on rendered frames per second, None to draw as fast as
+    possible
+    headless: no window, input or assets, only update systems get run
+    through ``run_ticks``
+    """
+
+    # longest frame that gets simulated, past it the game slows down
+    # instead of trying to catch up forever
+    max_frame_time = 0.25
 
-    def __init__(self):
+    def __init__(
+        self,
+        tick_rate: int = 60,
+        max_fps: Optional[int] = 144,
+        headless: bool = False
+    ):
 
         from .input import Input
         from .display import Display
+        from .timing import FrameStats
+        from .profiler import Profiler
+        from .assets import Assets
         
-        pygame.init()
-        self.display = Display()
+        self.headless = headless
+        if not headless:
+            pygame.init()
+
+        self.display = Display(dirty_rects=True, headless=headless)
         self.input = Input()
         self.level = Level()
+        self.stats = FrameStats()
+        self.profiler = Profiler()
+        self.assets = Assets()
+
+        self.tick_rate = tick_rate
+        self.max_fps = max_fps
 
-        self.delta = 0
+        self.delta = 1 / tick_rate
+
+        # how far into the next tick the frame being drawn is, 0 to 1
+        self.alpha = 1.
 
         self._stop = False
-        self._prev_time = time()
-        self._current_time = time()
 
     def init(self):
 
@@ -125,6 +626,10 @@ class Game:
         from .display import Camera
         from .humanoid import Humanoid
 
+        # decodes while the map generates
+        if not self.headless:
+            self.assets.preload_manifest('res/assets.json')
+
         # default entities
         _map = self.level.spawn('map')
         self.map = _map.add_component(Map, 50, 50, 64)
@@ -142,46 +647,153 @@ class Game:
             humanoid.add_component(
                 Humanoid, Vector2(i, i))
 
-        print(self.level.entities.keys())
+    def stop(self):
+        self._stop = True
+
+    def profile(self, enabled: bool = True, overlay: bool = False):
+        """Start or stop recording into ``self.profiler``, overlay also
+        shows the costliest spans on screen.
+        """
+        profiler = self.profiler if enabled else None
+        self.level.profiler = profiler
+        self.display.profiler = profiler
+
+        if overlay and enabled and 'profiler' not in self.level.entities:
+            from .profiler import ProfilerOverlay
+            self.level.spawn('profiler').add_component(ProfilerOverlay)
+
+        if not enabled and 'profiler' in self.level.entities:
+            self.level.destroy('profiler')
+
+    def tick(self):
+        self.level.ticks += 1
+        self.level.perform_calls('update')
+
+    def frame(self):
+        self.level.perform_calls('draw')
+
+        # entities only get to draw while near the screen
+        camera = self.display.camera
+        if camera is not None:
+            visible = self.level.index.diamond(*camera.visible_diamond())
+            visible.sort(key=attrgetter('id'))
+            self.level.perform_calls_for('draw_visible', visible)
+
+        self.display.present()
+
+    def run_ticks(self, ticks: int) -> dict:
+        """Run update systems ticks times back to back, as fast as they
+        go, returns how long it took.
+        """
+        # no frames without a display, every tick counts as one so the
+        # profiler keeps a window of ticks
+        profiler = self.level.profiler
+        start = perf_counter()
+        for _ in range(ticks):
+            if profiler is not None:
+                profiler.begin_frame()
+
+            self.tick()
+
+            if profiler is not None:
+                profiler.end_frame()
+        seconds = perf_counter() - start
+
+        self.stats.ticks += ticks
+        return {
+            'ticks': ticks,
+            'seconds': seconds,
+            'ticks_per_second': ticks / seconds if seconds else 0.
+        }
 
     def run(self):
+        assert not self.headless
+        tick = 1 / self.tick_rate
+        frame_time = 1 / self.max_fps if self.max_fps else 0
+
         try:
-            while not self._stop:    
-                self._current_time = time()
-                self.delta = self._current_time - self._prev_time
+            # everything starts at rest
+            self.level.ticks += 1
 
-                print(1 / self.delta)
+            accumulator = 0.
+            prev_time = perf_counter()
+            while not self._stop:    
+                frame_start = perf_counter()
+                elapsed = frame_start - prev_time
+                prev_time = frame_start
 
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         self._stop = True
+                    else:
+                        self.input.handle(event)
+
+                # replays run on the recorded frame times, so they tick
+                # exactly like the recorded session
+                frame_delta = self.input.update(elapsed)
+
+                # nothing left to replay, this frame would run on the real
+                # time with the last keys held
+                if self.input.replay_done:
+                    break
+
+                accumulator += min(frame_delta, self.max_frame_time)
+
+                # wheel up zooms in
+                camera = self.display.camera
+                if self.input.wheel and camera is not None:
+                    camera.set_zoom_level(camera.zoom_level - self.input.wheel)
 
-                self.input.update()
+                profiler = self.level.profiler
+                if profiler is not None:
+                    profiler.begin_frame()
 
-                self.level.perform_calls('update')
-                self.level.perform_calls('draw')
+                ticks = 0
+                while accumulator >= tick:
+                    self.tick()
+                    accumulator -= tick
+                    ticks += 1
 
-                self.display.present()
+                self.alpha = accumulator / tick
+                self.frame()
 
-                self._prev_time = self._current_time
-                
+                if profiler is not None:
+                    profiler.end_frame()
+
+                work = perf_counter() - frame_start
+                self.stats.record(elapsed, work, ticks)
+
+                if work < frame_time:
+                    sleep(frame_time - work)
 
         except Exception:
             traceback.print_exc()
             breakpoint()
 
         finally:
+            self.input.close()
+            self.assets.close()
             pygame.quit()
 
 
 _GAME = None
 
-def run_game():
+def init_game(**kwargs) -> Game:
     global _GAME
     assert _GAME == None
-    _GAME = Game()
+    _GAME = Game(**kwargs)
     _GAME.init()
-    _GAME.run()
+    return _GAME
+
+def run_game():
+    init_game().run()
+
+def run_headless(ticks: int, seed: int = 0) -> dict:
+    """Simulate ticks updates of a headless game, the map and everything
+    else random comes from seed so runs are repeatable.
+    """
+    random.seed(seed)
+    return init_game(headless=True).run_ticks(ticks)
 
 def game_state():
     global _GAME
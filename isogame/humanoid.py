@@ -1,45 +1,89 @@
 #!/usr/bin/env python3
 
-import pygame
+from math import atan2, pi
+from typing import Tuple
 
+from pygame import Rect, Surface
 from pygame.math import Vector2
 
 from .ecs import on_call
-from .display import Drawable, Camera
+from .display import Drawable, Camera, LAYER_ENTITIES, order_key
 
 
 class Humanoid(Drawable):
+    """Someone walking around the map, drawn from the frames of sprite in
+    the game atlas. Sprites with 8 frames are turned renders, frame i the
+    model rotated by i * 45 degrees, and show the way it last moved.
+    """
 
-    def __init__(self, entity, pos: Vector2):
+    def __init__(self, entity, pos: Vector2, sprite: str = 'humanoid'):
         super().__init__(entity)
         self.position = pos
         self.map = self.game.map
+        self.sprite = sprite
+        self.facing = 0
 
-        self._graphic = pygame.image.load("res/humanoid_medium.png")
         self._anchor = Vector2(.5, .875)
-        self._anchor_deltas = Vector2(
-            self._anchor.x * self._graphic.get_width(),
-            self._anchor.y * self._graphic.get_height()
-        )
+        self._atlas = None
+        self._frames = []
+        self._anchor_deltas = Vector2(0)
+        if not self.game.headless:
+            self._atlas = self.game.assets.atlas('res/atlas.json')
+            self._frames = self._atlas.frames(sprite)
+            self._anchor_deltas = Vector2(
+                self._anchor.x * self._frames[0].width,
+                self._anchor.y * self._frames[0].height
+            )
         self._cam = self.game.camera.get_component(Camera)
 
-    @on_call('draw')
+    def _frame(self) -> Tuple[Surface, Rect]:
+        """Sheet and frame rect to draw at the camera zoom
+        """
+        index = 0
+        if len(self._frames) == 8:
+            prev = self.entity.prev_position
+            pos = self.entity.position
+            if pos != prev:
+                self.facing = round(
+                    atan2(pos.y - prev.y, pos.x - prev.x) / (pi / 4)) % 8
+            index = self.facing
+
+        surface, sprites = self._atlas.mip(self._cam.zoom_level)
+        return surface, sprites[self.sprite][index]
+
+    @on_call('draw_visible')
     def draw(self):
-        self.display.draw(self)
- 
-    def get_order_value(self) -> int:
-        cam_world = self.map.iso_to_cartesian(
-            self.game.camera.position)
-        cam_world.y += self.display.size.y / 2
-        return -int(
-            self.map.cartesian_to_iso(cam_world)
-                .distance_to(self.entity.position)
+        # goes into the display sprite batch instead of getting a
+        # raw_draw call, further down the screen is closer to the viewer
+        # and screen y only depends on y - x
+        pos = self.entity.lerp_position(self.game.alpha)
+        surface, frame = self._frame()
+        self.display.blit(
+            surface,
+            self._screen_pos(pos),
+            order_key(LAYER_ENTITIES, pos.y - pos.x),
+            frame
         )
 
-    def raw_draw(self):
-        world_coords = (
-            self.map.iso_to_cartesian(self.entity.position)
-            - self._anchor_deltas
-            + self._cam.get_draw_delta()
+    def _screen_pos(self, pos: Vector2) -> Tuple[float, float]:
+        # iso_to_cartesian without the temporary vectors
+        zoom = self._cam.zoom
+        size = self.map.cartesian_size * zoom
+        dx, dy = self._cam.draw_offset()
+        return (
+            (pos.x + pos.y) / 2 * size - self._anchor_deltas.x * zoom + dx,
+            (pos.y - pos.x) / 4 * size - self._anchor_deltas.y * zoom + dy
         )
-        self.display.screen.blit(self._graphic,  world_coords)
+
+    def get_rect(self) -> Rect:
+        return Rect(
+            self._screen_pos(self.entity.lerp_position(self.game.alpha)),
+            self._frame()[1].size
+        )
+
+    def raw_draw(self):
+        surface, frame = self._frame()
+        self.display.screen.blit(
+            surface,
+            self._screen_pos(self.entity.lerp_position(self.game.alpha)),
+            frame)
@@ -1,5 +1,17 @@
 #!/usr/bin/env python3
 
+"""Input state fed from the pygame event queue.
+
+Only keys bound to an action get tracked, each one is a bit of the key
+masks. Every frame the state can be written to an input recording, a
+header followed by one fixed size record per frame, and a recording
+played back gives the same frames with the same timing.
+"""
+
+import struct
+
+from typing import Dict, Iterable, Optional, Tuple
+
 import pygame
 
 from pygame import (
@@ -10,25 +22,103 @@ from pygame import (
 from pygame.math import Vector2
 
 
-def get_index_or(i, default, array):
-    try:
-        return array[i]
-    except IndexError:
-        return default
+DEFAULT_ACTIONS = {
+    'up': (K_UP, K_w),
+    'down': (K_DOWN, K_s),
+    'left': (K_LEFT, K_a),
+    'right': (K_RIGHT, K_d),
+}
+
+MAGIC = b'ISOI'
+VERSION = 1
+
+# magic, version, seed, amount of bound keys, followed by the keys as
+# uint32 in bit order
+HEADER = struct.Struct('<4sHqH')
+KEY = struct.Struct('<I')
+
+# frame seconds, keys down, pressed, released, mouse buttons (3 bits
+# each of down, pressed and released), mouse x, mouse y, wheel
+FRAME = struct.Struct('<dHHHHhhb')
+
+MAX_KEYS = 16
+
+
+class InputFormatError(Exception):
+    ...
+
+
+class InputRecorder:
+    """Appends the input state of every frame to a recording
+    """
+
+    def __init__(self, path: str, keys: Iterable[int], seed: int = 0):
+        keys = list(keys)
+        self.path = path
+        self.frames = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, seed, len(keys)))
+        for key in keys:
+            self._file.write(KEY.pack(key))
+
+    def write(self, frame: tuple):
+        self._file.write(FRAME.pack(*frame))
+        self.frames += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class InputReplay:
+    """Frames of a recording in order, ``seed`` is the one the recorded
+    game was started with.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < HEADER.size:
+            raise InputFormatError(f'{path}: truncated header')
+
+        magic, version, self.seed, amount = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise InputFormatError(f'{path}: not an input recording')
+
+        if version != VERSION:
+            raise InputFormatError(
+                f'{path}: unsupported input recording version {version}')
+
+        offset = HEADER.size + amount * KEY.size
+        self.keys = [
+            KEY.unpack_from(data, HEADER.size + i * KEY.size)[0]
+            for i in range(amount)
+        ]
+
+        # a recording cut short by a crash just ends early
+        end = offset + (len(data) - offset) // FRAME.size * FRAME.size
+        self._frames = FRAME.iter_unpack(data[offset:end])
+        self.frames = (end - offset) // FRAME.size
+
+    def next(self) -> Optional[tuple]:
+        return next(self._frames, None)
 
 
 class Input():
+    """Keys bound to actions, the mouse and the wheel, from the events
+    passed to ``handle`` since the last ``update``.
 
-    def __init__(self):
-        self.axis = Vector2(0)
+    actions: action name to the keys that trigger it, the arrows and
+    wasd by default
+    """
 
-        self.keys_down = []  # pressed right now
-        self.keys_pressed = []  # pressed this frame
-        self.keys_released = []  # released this frame
+    def __init__(self, actions: Optional[Dict[str, Tuple[int, ...]]] = None):
+        self.axis = Vector2(0)
 
-        self.mouse_down = (False, False, False)
-        self.mouse_pressed = (False, False, False)
-        self.mouse_released = (False, False, False)
+        self.mouse_pos = (0, 0)
+        self.wheel = 0  # wheel steps this frame, up is positive
 
         self.selecting = False
         self.selection_color = (255, 255, 255)
@@ -37,82 +127,205 @@ class Input():
         self.selection_in_progress = Vector2(0)
         self.selection_end = Vector2(0)
 
+        # state of the frame, what update latched
+        self._down = 0
+        self._pressed = 0
+        self._released = 0
+        self._mouse_down = 0
+        self._mouse_pressed = 0
+        self._mouse_released = 0
+
+        # edges seen since the last update
+        self._next_pressed = 0
+        self._next_released = 0
+        self._next_mouse_pressed = 0
+        self._next_mouse_released = 0
+        self._next_wheel = 0
+
+        self.recorder: Optional[InputRecorder] = None
+        self.replay: Optional[InputReplay] = None
+        self.replay_done = False
+
+        self.bind(DEFAULT_ACTIONS if actions is None else actions)
+
+    def bind(self, actions: Dict[str, Tuple[int, ...]]):
+        """Track only the keys of actions from now on
+        """
+        keys = sorted({key for action in actions.values() for key in action})
+        if len(keys) > MAX_KEYS:
+            raise ValueError(f'at most {MAX_KEYS} keys can be bound')
+
+        self.actions = {
+            action: tuple(action_keys)
+            for action, action_keys in actions.items()
+        }
+        self.keys = keys
+        self._bits = {key: 1 << i for i, key in enumerate(keys)}
+        self._action_bits = {
+            action: sum(self._bits[key] for key in set(action_keys))
+            for action, action_keys in self.actions.items()
+        }
+
+        self._down = self._pressed = self._released = 0
+        self._next_pressed = self._next_released = 0
+
     def is_down(self, key) -> bool:
-        return self.keys_down[key]
+        return bool(self._down & self._bits.get(key, 0))
 
     def was_pressed(self, key) -> bool:
-        return self.keys_pressed[key]
+        return bool(self._pressed & self._bits.get(key, 0))
 
     def was_released(self, key) -> bool:
-        return self.keys_released[key]
+        return bool(self._released & self._bits.get(key, 0))
+
+    def is_action_down(self, action: str) -> bool:
+        return bool(self._down & self._action_bits.get(action, 0))
+
+    def was_action_pressed(self, action: str) -> bool:
+        return bool(self._pressed & self._action_bits.get(action, 0))
+
+    def was_action_released(self, action: str) -> bool:
+        return bool(self._released & self._action_bits.get(action, 0))
 
     def is_mouse_down(self, btn) -> bool:
-        return self.mouse_down[btn]
+        return bool(self._mouse_down & (1 << btn))
 
     def was_mouse_pressed(self, btn) -> bool:
-        return self.mouse_pressed[btn]
+        return bool(self._mouse_pressed & (1 << btn))
 
     def was_mouse_released(self, btn) -> bool:
-        return self.mouse_released[btn] 
-
-    def update(self):
-        keys = pygame.key.get_pressed()
-        self.keys_pressed = [
-            True
-            if not get_index_or(key, False, self.keys_down) and value
-            else False
-            for key, value in enumerate(keys)
-        ]
-        self.keys_released = [
-            True
-            if get_index_or(key, False, self.keys_down) and not value
-            else False
-            for key, value in enumerate(keys)
-        ]
-        self.keys_down = keys
-
-        mouse_buttons = pygame.mouse.get_pressed(num_buttons=3)
-        self.mouse_pressed = [
-            True
-            if not self.mouse_down[btn] and value
-            else False
-            for btn, value in enumerate(mouse_buttons)
-        ]
-        self.mouse_released = [
-            True
-            if self.mouse_down[btn] and not value
-            else False
-            for btn, value in enumerate(mouse_buttons)
-        ]
-        self.mouse_down = mouse_buttons
+        return bool(self._mouse_released & (1 << btn))
+
+    def handle(self, event):
+        """Feed an event from ``pygame.event.get``, ignored while a
+        recording is playing
+        """
+        if self.replay is not None:
+            return
+
+        if event.type == pygame.KEYDOWN:
+            bit = self._bits.get(event.key)
+            if bit:
+                self._down |= bit
+                self._next_pressed |= bit
+
+        elif event.type == pygame.KEYUP:
+            bit = self._bits.get(event.key)
+            if bit:
+                self._down &= ~bit
+                self._next_released |= bit
+
+        elif event.type == pygame.MOUSEMOTION:
+            self.mouse_pos = event.pos
+
+        # buttons 1 to 3 are left, middle and right, wheel steps come in
+        # as MOUSEWHEEL too
+        elif event.type == pygame.MOUSEBUTTONDOWN and 1 <= event.button <= 3:
+            bit = 1 << (event.button - 1)
+            self._mouse_down |= bit
+            self._next_mouse_pressed |= bit
+            self.mouse_pos = event.pos
+
+        elif event.type == pygame.MOUSEBUTTONUP and 1 <= event.button <= 3:
+            bit = 1 << (event.button - 1)
+            self._mouse_down &= ~bit
+            self._next_mouse_released |= bit
+            self.mouse_pos = event.pos
+
+        elif event.type == pygame.MOUSEWHEEL:
+            self._next_wheel += event.y
+
+        # key ups don't come while the window is in the background
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            self._next_released |= self._down
+            self._down = 0
+
+    def record(self, path: str, seed: int = 0):
+        """Write the state of every following frame to path
+        """
+        self.recorder = InputRecorder(path, self.keys, seed)
+
+    def play(self, path: str) -> InputReplay:
+        """Take the state of the following frames from the recording at
+        path instead of events
+        """
+        replay = InputReplay(path)
+        if replay.keys != self.keys:
+            raise InputFormatError(
+                f'{path}: recorded with other key bindings')
+
+        self.replay = replay
+        self.replay_done = False
+        return replay
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def update(self, frame_time: float = 0.) -> float:
+        """Latch the events of the frame, returns the frame time, which
+        comes from the recording while one is playing.
+        """
+        if self.replay is not None:
+            frame = self.replay.next()
+            if frame is None:
+                self.replay = None
+                self.replay_done = True
+            else:
+                frame_time = self._load(frame)
+
+        else:
+            self._pressed, self._next_pressed = self._next_pressed, 0
+            self._released, self._next_released = self._next_released, 0
+            self._mouse_pressed = self._next_mouse_pressed
+            self._mouse_released = self._next_mouse_released
+            self._next_mouse_pressed = self._next_mouse_released = 0
+            self.wheel, self._next_wheel = self._next_wheel, 0
+
+        if self.recorder is not None:
+            self.recorder.write(self._frame(frame_time))
 
         if self.was_mouse_pressed(0):
             self.selecting = True
-            self.selection_begin = Vector2(*pygame.mouse.get_pos())
+            self.selection_begin = Vector2(self.mouse_pos)
 
         if self.is_mouse_down(0):
-            self.selection_in_progress = Vector2(*pygame.mouse.get_pos())
+            self.selection_in_progress = Vector2(self.mouse_pos)
 
         if self.was_mouse_released(0):
             self.selecting = False
-            self.selection_end = Vector2(*pygame.mouse.get_pos())
-
-        self.axis = Vector2(0)
+            self.selection_end = Vector2(self.mouse_pos)
 
-        if self.is_down(K_UP) or self.is_down(K_w):
-            self.axis.y -= 1
+        self.axis = Vector2(
+            self.is_action_down('right') - self.is_action_down('left'),
+            self.is_action_down('down') - self.is_action_down('up')
+        )
+        if self.axis.x != 0 or self.axis.y != 0:
+            self.axis = self.axis.normalize()
 
-        if self.is_down(K_DOWN) or self.is_down(K_s):
-            self.axis.y += 1
+        return frame_time
 
-        if self.is_down(K_LEFT) or self.is_down(K_a):
-            self.axis.x -= 1
+    def _frame(self, frame_time: float) -> tuple:
+        mouse = (
+            self._mouse_down |
+            self._mouse_pressed << 3 |
+            self._mouse_released << 6
+        )
+        return (
+            frame_time, self._down, self._pressed, self._released,
+            mouse, *self.mouse_pos, max(-128, min(127, self.wheel))
+        )
 
-        if self.is_down(K_RIGHT) or self.is_down(K_d):
-            self.axis.x += 1
+    def _load(self, frame: tuple) -> float:
+        (frame_time, self._down, self._pressed, self._released,
+         mouse, x, y, self.wheel) = frame
 
-        if self.axis.x != 0 or self.axis.y != 0:
-            self.axis = self.axis.normalize()
+        self._mouse_down = mouse & 7
+        self._mouse_pressed = (mouse >> 3) & 7
+        self._mouse_released = (mouse >> 6) & 7
+        self.mouse_pos = (x, y)
+        return frame_time
 
     # def get_order_value(self) -> int:
     #     return 10000
@@ -1,19 +1,26 @@
 #!/usr/bin/env python3
 
+import os
 import random
 
-from math import sqrt
+from math import ceil, floor, sqrt
+from typing import Optional, Set, Tuple
 
+import numpy as np
 import pygame
 
-from pygame import Rect
+from pygame import Rect, Surface
 from pygame.math import Vector2
 
-from opensimplex import OpenSimplex
-
 from .ecs import on_call
-from .utils import tint, diagonal_box_iter
-from .display import Drawable, Display, Camera
+from .utils import diamond_cells
+from .noise import FractalNoise
+from .tiles import TileGrid, ChunkedTiles, ChunkPager
+from .chunks import ChunkCache
+from .palette import TilePalette, tile_colors
+from .world import WorldFile
+from .display import (
+    Drawable, Display, Camera, LAYER_TERRAIN, LAYER_UI, ZOOM_LEVELS)
 
 
 def noise_to_tile_id(simplex, x, y, delta):
@@ -37,48 +44,142 @@ def noise_to_tile_id(simplex, x, y, delta):
 
 class Map(Drawable):
 
+    scrolls = True
+    layer = LAYER_TERRAIN
+
     def __init__(
         self,
         entity,
         iso_size_x: int,
         iso_size_y: int,
-        cartesian_size: int
+        cartesian_size: int,
+        chunk_size: int = 16,
+        chunk_cache_bytes: int = 64 * 1024 * 1024,
+        seed: int = None,
+        octaves: int = 1,
+        lacunarity: float = 2.0,
+        persistence: float = 0.5,
+        workers: int = 1,
+        streaming: bool = False,
+        stream_radius: int = 3,
+        max_chunks: int = 1024,
+        page_dir: str = None,
+        world_path: str = None
     ):
         super().__init__(entity)
+
+        self.map_delta = 20
+
+        # a world file overrides the generation settings, its chunks get
+        # streamed in from disk as the camera needs them
+        self.world = None
+        if world_path:
+            self.world = WorldFile(world_path)
+            iso_size_x, iso_size_y = self.world.size_x, self.world.size_y
+            seed = self.world.seed
+            chunk_size = self.world.chunk_size
+            self.map_delta = self.world.delta
+            streaming = True
+
         self.iso_size_x = iso_size_x
         self.iso_size_y = iso_size_y
 
         self.cartesian_size = cartesian_size
 
-        self.map_delta = 20
-
-        self._tile = pygame.image.load("res/tile_medium.png")
-        self.tile_size = Vector2(*self._tile.get_size())
+        self.tile_size = Vector2(cartesian_size, cartesian_size // 2)
 
-        assert self.tile_size.x == cartesian_size
-        assert self.tile_size.y == cartesian_size // 2
+        if seed is None:
+            seed = random.randint(0, 99999999)
+        self.seed = seed
+        self.noise = FractalNoise(
+            seed,
+            octaves=octaves,
+            lacunarity=lacunarity,
+            persistence=persistence
+        )
+        # terrain gets pre-rendered in square blocks of iso tiles, each
+        # block ends up on its own surface, a streaming map also generates
+        # and keeps its tiles in memory in blocks of the same size
+        self.chunk_size = chunk_size
+
+        # streaming maps only hold the chunks around the camera, they can
+        # leave both sizes as None for a world without edges
+        self.streaming = streaming
+        self.stream_radius = stream_radius
+        self.bounded = iso_size_x is not None and iso_size_y is not None
+        assert self.bounded or streaming
+
+        if streaming:
+            self.map_data = ChunkedTiles(
+                chunk_size, self.map_delta, self._generate_chunk,
+                size_x=iso_size_x,
+                size_y=iso_size_y,
+                max_chunks=max_chunks,
+                pager=self.world or (ChunkPager(page_dir) if page_dir else None)
+            )
 
-        self.tiles = []
-        for i in range(self.map_delta):
-            self.tiles.append(
-                tint(
-                    self._tile,
-                    [0,
-                    (i * 255) / self.map_delta,
-                    (max(0, i - 50) * 255) / self.map_delta]
-                )
+        # more than one worker spreads generation over a process pool,
+        # the tiles come out the same either way
+        elif workers == 1:
+            self.map_data = TileGrid(
+                iso_size_x, iso_size_y, self.map_delta,
+                data=self.noise.tile_ids(
+                    0, 0, iso_size_x, iso_size_y, self.map_delta)
+            )
+        else:
+            self.map_data = TileGrid(
+                iso_size_x, iso_size_y, self.map_delta,
+                data=self.noise.tile_ids_parallel(
+                    0, 0, iso_size_x, iso_size_y, self.map_delta,
+                    workers=workers)
             )
 
-        self.simplex = OpenSimplex(seed=random.randint(0, 99999999))
-        self.map_data = [
-            [
-                noise_to_tile_id(self.simplex, x, y, self.map_delta)
-                for x in range(iso_size_x)
-            ]
-            for y in range(iso_size_y)
-        ]
+        self.chunks_x, self.chunks_y = None, None
+        if self.bounded:
+            self.chunks_x = ceil(iso_size_x / chunk_size)
+            self.chunks_y = ceil(iso_size_y / chunk_size)
+        self.chunk_pixel_size = (
+            int(chunk_size * self.tile_size.x),
+            int(chunk_size * self.tile_size.y)
+        )
+        self.chunks = ChunkCache(self._render_chunk, chunk_cache_bytes)
+
+        # chunks of a tile grid edited since the last save, chunked tiles
+        # keep their own, see dirty_chunks
+        self._dirty_chunks = set()
+
+        # called as listener(x, y, width, height) after tiles change
+        self.tile_listeners = []
 
         self._cam = None
+        self._stream_center = None
+
+        # one color per tile id, shared with the minimap. Headless games
+        # never draw, they skip loading the tileset and its variants
+        self._tile = None
+        self.palette = TilePalette(None, tile_colors(self.map_delta))
+        self.tiles = []
+        if not self.game.headless:
+            self._load_tiles()
+
+    def _load_tiles(self):
+        atlas = self.game.assets.atlas('res/atlas.json')
+        self._tile = atlas.subsurface('tile_medium')
+        assert Vector2(*self._tile.get_size()) == self.tile_size
+
+        self.palette.tile = self._tile
+        self.tiles = self.palette.variants()
+
+    def zoomed_tiles(self, level: int = 0) -> list:
+        """Tile variants scaled down to a camera zoom level, baked like
+        the full size ones
+        """
+        if level == 0:
+            return self.tiles
+
+        zoom = ZOOM_LEVELS[level]
+        return self.palette.variants(
+            (int(self.tile_size.x * zoom), int(self.tile_size.y * zoom)))
 
     def iso_to_cartesian(self, pos: Vector2) -> Vector2:
         return Vector2(
@@ -92,58 +193,402 @@ class Map(Drawable):
             pos.x + (2 * pos.y)
         ) / self.cartesian_size
 
+    def iso_to_cartesian_array(self, points: np.ndarray) -> np.ndarray:
+        """``iso_to_cartesian`` over an (N, 2) array of points
+        """
+        points = np.asarray(points, dtype=np.float64)
+        x, y = points[:, 0], points[:, 1]
+        return np.stack((
+            (x + y) / 2,
+            (-x + y) / 4
+        ), axis=1) * self.cartesian_size
+
+    def cartesian_to_iso_array(self, points: np.ndarray) -> np.ndarray:
+        """``cartesian_to_iso`` over an (N, 2) array of points
+        """
+        points = np.asarray(points, dtype=np.float64)
+        x, y = points[:, 0], points[:, 1]
+        return np.stack((
+            x - (2 * y),
+            x + (2 * y)
+        ), axis=1) / self.cartesian_size
+
+    def pick_tiles(self, points: np.ndarray) -> np.ndarray:
+        """Coords of the tiles under an (N, 2) array of cartesian points,
+        a tile image has its diamond centered on the iso point (x, y + 1).
+        """
+        iso = self.cartesian_to_iso_array(points)
+        return np.floor(iso + (0.5, -0.5)).astype(np.int64)
+
+    def get_tile(self, x: int, y: int) -> int:
+        return self.map_data.get(x, y)
+
+    @property
+    def dirty_chunks(self) -> Set[Tuple[int, int]]:
+        """Chunks edited since the last save. Streaming maps use the set
+        of their chunked tiles, edited chunks evicted to the world file
+        leave it as they're written to it.
+        """
+        if self.streaming:
+            return self.map_data.dirty
+        return self._dirty_chunks
+
+    def _touch_chunk(self, cx: int, cy: int):
+        self.chunks.invalidate(cx, cy)
+        self.display.invalidate(self.chunk_rect(cx, cy))
+        if not self.streaming and self.chunk_in_bounds(cx, cy):
+            self._dirty_chunks.add((cx, cy))
+
+    def set_tile(self, x: int, y: int, tile_id: int):
+        self.map_data.set(x, y, tile_id)
+        self._touch_chunk(x // self.chunk_size, y // self.chunk_size)
+
+        for listener in self.tile_listeners:
+            listener(x, y, 1, 1)
+
+    def fill_tiles(self, x: int, y: int, width: int, height: int, tile_id: int):
+        self.map_data.fill(x, y, width, height, tile_id)
+
+        n = self.chunk_size
+        for cx in range(x // n, (x + width - 1) // n + 1):
+            for cy in range(y // n, (y + height - 1) // n + 1):
+                self._touch_chunk(cx, cy)
+
+        for listener in self.tile_listeners:
+            listener(x, y, width, height)
+
+    def save(self, path: str = None):
+        """Write the whole map to a new world file at path, which the map
+        keeps as its world file. Without a path, or with the path of the
+        current world file, only the chunks edited since the last save get
+        written back to it.
+        """
+        if (path is not None and self.world is not None and
+                os.path.exists(path) and
+                os.path.samefile(path, self.world.path)):
+            path = None
+
+        n = self.chunk_size
+        if path is None:
+            if self.world is None:
+                raise ValueError('map has no world file to save to')
+
+            for cx, cy in sorted(self.dirty_chunks):
+                self.world.write_chunk(
+                    cx, cy, self.map_data.region(cx * n, cy * n, n, n))
+
+            self.world.flush()
+            self.dirty_chunks.clear()
+            return
+
+        if not self.bounded:
+            raise ValueError('can\'t save a map without bounds')
+
+        # built next to the destination and moved over it once complete,
+        # the current world file may still be paging in the tiles
+        tmp = f'{path}.{os.getpid()}.tmp'
+        try:
+            with WorldFile.create(
+                tmp, self.seed,
+                self.iso_size_x, self.iso_size_y,
+                self.map_delta, n
+            ) as world:
+                for cx in range(self.chunks_x):
+                    for cy in range(self.chunks_y):
+                        world.write_chunk(
+                            cx, cy, self.map_data.region(cx * n, cy * n, n, n))
+
+            os.replace(tmp, path)
+
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        world = WorldFile(path)
+        self.dirty_chunks.clear()
+
+        if self.world:
+            self.world.close()
+        self.world = world
+
+        if self.streaming:
+            self.map_data.pager = world
+
+    def chunk_in_bounds(self, cx: int, cy: int) -> bool:
+        return not self.bounded or (
+            0 <= cx < self.chunks_x and 0 <= cy < self.chunks_y)
+
+    def _generate_chunk(self, cx: int, cy: int):
+        n = self.chunk_size
+        return self.noise.tile_ids(cx * n, cy * n, n, n, self.map_delta)
+
+    @on_call('update')
+    def stream(self):
+        if not self.streaming:
+            return
+
+        self.map_data.poll()
+
+        n = self.chunk_size
+        cam = self.game.camera.position
+        camera = self.display.camera
+        center = (int(cam.x // n), int(cam.y // n))
+        level = camera.zoom_level if camera is not None else 0
+        if (center, level) == self._stream_center:
+            return
+        self._stream_center = (center, level)
+
+        # the radius around the camera plus whatever is on screen, which
+        # zoomed out goes well past the radius. Grown by a chunk, the
+        # camera can go anywhere in the center chunk before this runs
+        # again.
+        ccx, ccy = center
+        radius = self.stream_radius
+        wanted = {
+            (cx, cy)
+            for cx in range(ccx - radius, ccx + radius + 1)
+            for cy in range(ccy - radius, ccy + radius + 1)
+        }
+        if camera is not None:
+            cells = self.visible_chunks(
+                camera.get_draw_delta(), self.display.size, camera.zoom)
+            wanted.update(
+                (cx + dx, cy + dy)
+                for cx, cy in cells.tolist()
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+            )
+
+        # the chunks right around the camera are needed this frame, the
+        # rest gets generated in the background, nearest first
+        wanted = sorted(
+            (c for c in wanted if self.chunk_in_bounds(*c)),
+            key=lambda c: max(abs(c[0] - ccx), abs(c[1] - ccy))
+        )
+        for cx, cy in wanted:
+            if max(abs(cx - ccx), abs(cy - ccy)) <= 1:
+                self.map_data.chunk(cx, cy)
+            else:
+                self.map_data.request(cx, cy)
+
+        # one chunk of slack so going back and forth over a chunk border
+        # doesn't regenerate anything
+        kept = wanted or [center]
+        xs = [cx for cx, _ in kept]
+        ys = [cy for _, cy in kept]
+        self.map_data.evict_outside(
+            min(xs) - 1, min(ys) - 1, max(xs) + 2, max(ys) + 2)
+
+    def chunk_origin(self, cx: int, cy: int) -> Vector2:
+        """Top left corner of a chunk surface in cartesian coords,
+        the top most tile of the chunk is its last one on the x axis.
+        """
+        n = self.chunk_size
+        return self.iso_to_cartesian(Vector2(cx * n, cy * n)) - Vector2(
+            0, ((n - 1) * self.cartesian_size) / 4)
+
+    def chunk_rect(self, cx: int, cy: int) -> Optional[Rect]:
+        """Screen rect of a chunk image at the camera zoom, None without
+        a camera
+        """
+        camera = self.display.camera
+        if camera is None:
+            return None
+
+        zoom = camera.zoom
+        n = self.chunk_size
+        pos = self.chunk_origin(cx, cy) * zoom + camera.get_draw_delta()
+        return Rect(
+            floor(pos.x), floor(pos.y),
+            ceil(n * self.tile_size.x * zoom) + 1,
+            ceil(n * self.tile_size.y * zoom) + 1
+        )
+
+    def _render_chunk(self, cx: int, cy: int, level: int = 0) -> Surface:
+        # zoomed out chunks are put together from scaled tiles instead of
+        # scaling the full chunk, which costs about the same as rendering
+        # it and keeps tile edges as sharp
+        n = self.chunk_size
+        zoom = ZOOM_LEVELS[level]
+        surf = Surface(
+            (int(self.chunk_pixel_size[0] * zoom),
+             int(self.chunk_pixel_size[1] * zoom)),
+            pygame.SRCALPHA
+        )
+        block = self.map_data.region(cx * n, cy * n, n, n)
+
+        # neighbouring tiles share their edge pixels, blit them top to
+        # bottom on screen (by y - x) like a full redraw would
+        x, y = np.nonzero(np.ones(block.shape, dtype=bool))
+        order = np.lexsort((x, y - x))
+        x, y = x[order], y[order]
+
+        # tile positions relative to the chunk surface origin
+        pos = (self.iso_to_cartesian_array(
+            np.stack((x, y), axis=1)) + (0, ((n - 1) * self.cartesian_size) / 4)
+        ) * zoom
+
+        tiles = self.zoomed_tiles(level)
+        surf.blits(
+            [(tiles[tile_id], tile_pos)
+             for tile_id, tile_pos in zip(block[x, y].tolist(), pos.tolist())],
+            doreturn=False
+        )
+
+        return surf
+
+    def _visible_cells(
+        self,
+        draw_delta: Vector2,
+        screen_size: Vector2,
+        cell_size: int,
+        offset_y: float
+    ) -> np.ndarray:
+        """Exact set of cells of a cell_size tiles grid whose image lands on
+        screen, as an (N, 2) array sorted top to bottom.
+
+        A cell image is cell_size times a tile image in size, with its top
+        left corner at ``iso_to_cartesian(cell * cell_size)`` moved down by
+        offset_y.
+        """
+        left = -draw_delta.x
+        top = -draw_delta.y - offset_y
+
+        # a cell is on screen if its image top left corner is inside the
+        # screen rect grown by one cell image up and to the left, that rect
+        # back in iso space turned 45 degrees gives the cell ranges
+        begin = self.cartesian_to_iso(Vector2(
+            left - cell_size * self.tile_size.x,
+            top - cell_size * self.tile_size.y
+        )) / cell_size
+        end = self.cartesian_to_iso(Vector2(
+            left + screen_size.x,
+            top + screen_size.y
+        )) / cell_size
+
+        cells = diamond_cells(
+            floor(begin.x + begin.y) + 1, ceil(end.x + end.y),
+            floor(begin.y - begin.x) + 1, ceil(end.y - end.x)
+        )
+
+        if self.bounded:
+            x, y = cells[:, 0], cells[:, 1]
+            cells = cells[
+                (x >= 0) & (x * cell_size < self.iso_size_x) &
+                (y >= 0) & (y * cell_size < self.iso_size_y)
+            ]
+
+        return cells
+
+    def visible_tiles(
+        self,
+        draw_delta: Vector2,
+        screen_size: Vector2,
+        zoom: float = 1.
+    ) -> np.ndarray:
+        # zoomed the screen covers more of the unzoomed world
+        return self._visible_cells(
+            draw_delta / zoom, screen_size / zoom, 1, 0)
+
+    def visible_chunks(
+        self,
+        draw_delta: Vector2,
+        screen_size: Vector2,
+        zoom: float = 1.
+    ) -> np.ndarray:
+        n = self.chunk_size
+        return self._visible_cells(
+            draw_delta / zoom, screen_size / zoom,
+            n, -((n - 1) * self.cartesian_size) / 4)
+
     @on_call('draw')
     def draw(self):
         self.display.draw(self)
 
-    def get_order_value(self) -> int:
-        return -10000000
-
     def raw_draw(self):
         if not self._cam:
             self._cam = self.game.camera.get_component(Camera)
-        cam_iso = self.game.camera.position
-        cam_x, cam_y = (int(cam_iso.x), int(cam_iso.y))
-        cam_size_x, cam_size_y = (
-            int(self._cam.size.x / self.tile_size.x),
-            int(self._cam.size.y / self.tile_size.y)
+        draw_delta = self._cam.get_draw_delta()
+        level = self._cam.zoom_level
+        zoom = self._cam.zoom
+
+        if self.chunks.max_bytes <= 0:
+            self.draw_tiles(draw_delta, level)
+            return
+
+        cells = self.visible_chunks(draw_delta, self.display.size, zoom)
+        n = self.chunk_size
+        pos = self.iso_to_cartesian_array(cells * n) * zoom + (
+            draw_delta.x,
+            draw_delta.y - ((n - 1) * self.cartesian_size) / 4 * zoom
         )
-        
-        cam_x -= cam_size_x // 2
-        cam_y -= int(cam_size_y * 1.5)
-    
-        for lx, ly, x, y in diagonal_box_iter(
-            cam_x, cam_y - 2, cam_size_x * 2, (cam_size_y * 2) + 5):
-
-            if (x < 0 or x >= self.iso_size_x or 
-                y < 0 or y >= self.iso_size_y):
+
+        blits = []
+        for (cx, cy), chunk_pos in zip(cells.tolist(), pos.tolist()):
+
+            # still being generated in the background
+            if (self.streaming and (cx, cy) not in self.chunks and
+                not self.map_data.loaded(cx, cy)):
+                # the gap has to be redrawn once the chunk shows up
+                self.display.invalidate()
                 continue
 
-            world_pos = self.iso_to_cartesian(
-                Vector2(x, y)
-            ) + self._cam.get_draw_delta()
-            
-            self.display.screen.blit(
-                self.tiles[self.map_data[x][y]],
-                world_pos
-            )
+            blits.append((self.chunks.get(cx, cy, level), chunk_pos))
+
+        self.display.screen.blits(blits, doreturn=False)
+
+    def draw_tiles(self, draw_delta: Vector2, level: int = 0):
+        """Draw the visible tiles one by one straight to the screen, for
+        maps with chunk caching turned off.
+        """
+        zoom = ZOOM_LEVELS[level]
+        cells = self.visible_tiles(draw_delta, self.display.size, zoom)
+        if not len(cells):
+            return
+
+        x, y = cells[:, 0], cells[:, 1]
+        x_begin, y_begin = int(x.min()), int(y.min())
+        block = self.map_data.region(
+            x_begin, y_begin,
+            int(x.max()) - x_begin + 1, int(y.max()) - y_begin + 1
+        )
+
+        pos = self.iso_to_cartesian_array(cells) * zoom + (
+            draw_delta.x, draw_delta.y)
+
+        tiles = self.zoomed_tiles(level)
+        self.display.screen.blits(
+            [(tiles[tile_id], tile_pos)
+             for tile_id, tile_pos in zip(
+                block[x - x_begin, y - y_begin].tolist(), pos.tolist())],
+            doreturn=False
+        )
 
 
 
 class Minimap(Drawable):
 
-    def __init__(self, entity):
+    layer = LAYER_UI
+
+    def __init__(self, entity, window: int = 64):
         super().__init__(entity)
         self.map = self.game.map
 
+        # streaming maps only show a window x window box of tiles around
+        # the camera, starting at origin
+        self.window = window
+        self.origin = Vector2(0)
+
         self.cam_color = (218, 224, 44)
-        self.tile_colors = []
-        for i in range(self.map.map_delta):
-            self.tile_colors.append(
-                (0,
-                (i * 255) / self.map.map_delta,
-                (max(0, i - 50) * 255) / self.map.map_delta)
-            )
+        self.tile_colors = self.map.palette.colors
+
+        # terrain is drawn once onto this surface and patched as tiles
+        # change, only the camera rect gets drawn every frame
+        self._cache = None
+        self._cache_pos = Vector2(0)
+
+        self.map.tile_listeners.append(self._tiles_changed)
 
         self.set_scale(3)
         
@@ -153,10 +598,18 @@ class Minimap(Drawable):
             self._tile_size.x / self.map.tile_size.x,
             self._tile_size.y / self.map.tile_size.y
         )
+        view_x, view_y = self.view_size()
         self.size = Vector2(
-            self._tile_size.x * self.map.iso_size_x,
-            ((self._tile_size.y * self.map.iso_size_y) / 2) + self._tile_size.y / 2
+            self._tile_size.x * view_x,
+            ((self._tile_size.y * view_y) / 2) + self._tile_size.y / 2
         )
+        self._cache = None
+
+    def view_size(self):
+        if self.map.streaming:
+            return self.window, self.window
+
+        return self.map.iso_size_x, self.map.iso_size_y
 
     def world_to_mini(self, point: Vector2) -> Vector2:
         return (self.display.size - self.size) + Vector2(
@@ -164,43 +617,147 @@ class Minimap(Drawable):
             point.y * self.scale_ratio.y
         )
 
+    def _tile_pos(self, x: int, y: int) -> Vector2:
+        """Screen position of a tile in view coords
+        """
+        return Vector2(*self._tile_pos_array(np.array([[x, y]]))[0])
+
+    def _tile_pos_array(self, tiles: np.ndarray) -> np.ndarray:
+        pos = self.display.size - self.size
+        return (self.map.iso_to_cartesian_array(
+            tiles * (self._tile_size.x, self._tile_size.y * 2)
+        ) / self.map.cartesian_size) + (pos.x, pos.y)
+
+    def _build_cache(self):
+        view_x, view_y = self.view_size()
+
+        # the first column of tiles goes up past the minimap position,
+        # the cache starts on a whole pixel so tiles truncate to the same
+        # pixels they would on screen
+        top_left = self._tile_pos(view_x - 1, 0)
+        bottom_right = self._tile_pos(0, view_y - 1) + self._tile_size
+        right = self._tile_pos(view_x - 1, view_y - 1) + self._tile_size
+        self._cache_pos = Vector2(
+            floor(self._tile_pos(0, 0).x), floor(top_left.y))
+        self._cache = Surface(
+            (ceil(right.x - self._cache_pos.x) + 1,
+             ceil(bottom_right.y - self._cache_pos.y) + 1),
+            pygame.SRCALPHA
+        )
+        self._draw_tiles(0, 0, view_x, view_y)
+
+    def _draw_tiles(self, x_begin: int, y_begin: int, x_end: int, y_end: int):
+        """Draw a box of tiles in view coords onto the cache, in the same
+        order a full redraw uses as neighbouring tiles overlap.
+        """
+        view_x, view_y = self.view_size()
+        ox, oy = int(self.origin.x), int(self.origin.y)
+        x_begin, x_end = max(0, x_begin), min(view_x, x_end)
+        y_begin, y_end = max(0, y_begin), min(view_y, y_end)
+        if self.map.bounded:
+            x_begin, x_end = max(x_begin, -ox), min(x_end, self.map.iso_size_x - ox)
+            y_begin, y_end = max(y_begin, -oy), min(y_end, self.map.iso_size_y - oy)
+
+        if x_begin >= x_end or y_begin >= y_end:
+            return
+
+        block = self.map.map_data.region(
+            ox + x_begin, oy + y_begin, x_end - x_begin, y_end - y_begin)
+
+        # rows of y, x going left to right inside each row
+        y, x = np.mgrid[y_begin:y_end, x_begin:x_end]
+        x, y = x.ravel(), y.ravel()
+        pos = self._tile_pos_array(
+            np.stack((x, y), axis=1)) - (self._cache_pos.x, self._cache_pos.y)
+
+        cache = self._cache
+        colors = self.tile_colors
+        size = self._tile_size
+        for tile_id, tile_pos in zip(
+            block[x - x_begin, y - y_begin].tolist(), pos.tolist()):
+            pygame.draw.rect(cache, colors[tile_id], Rect(tile_pos, size))
+
+    def _tiles_changed(self, x: int, y: int, width: int, height: int):
+        if self._cache is None:
+            return
+
+        view_x, view_y = self.view_size()
+        x, y = x - int(self.origin.x), y - int(self.origin.y)
+        x_begin, x_end = max(0, x), min(view_x, x + width)
+        y_begin, y_end = max(0, y), min(view_y, y + height)
+        changed = max(0, x_end - x_begin) * max(0, y_end - y_begin)
+
+        # each patch redraws 9 tiles, past that a rebuild is cheaper
+        if changed * 9 >= view_x * view_y:
+            self._cache = None
+            return
+
+        # redrawing every tile that overlaps a changed one, clipped to it,
+        # leaves the same pixels a full redraw would
+        for tx in range(x_begin, x_end):
+            for ty in range(y_begin, y_end):
+                self._cache.set_clip(Rect(
+                    self._tile_pos(tx, ty) - self._cache_pos, self._tile_size))
+                self._draw_tiles(tx - 1, ty - 1, tx + 2, ty + 2)
+
+        self._cache.set_clip(None)
+
+        # same rect as last frame, the display wouldn't redraw it
+        self.display.invalidate(self._cache.get_rect(topleft=self._cache_pos))
+
     @on_call('draw')
     def draw(self):
         self.display.draw(self)
 
-    def get_order_value(self) -> int:
-        return 1000000
+    def _follow_camera(self):
+        if not self.map.streaming:
+            return
+
+        # keep the window on whole chunks so it only gets rebuilt when
+        # the camera moves to another chunk
+        n = self.map.chunk_size
+        cam = self.game.camera.position
+        origin = Vector2(
+            (cam.x // n) * n + n // 2 - self.window // 2,
+            (cam.y // n) * n + n // 2 - self.window // 2
+        )
+        if origin != self.origin:
+            self.origin = origin
+            self._cache = None
+
+    def _cam_rect(self) -> Rect:
+        zoom = self.display.camera.zoom
+        scaled_size = Vector2(
+            self.display.size.x * self.scale_ratio.x / zoom,
+            self.display.size.y * self.scale_ratio.y / zoom
+        )
+        return Rect(
+            self.world_to_mini(
+                self.map.iso_to_cartesian(
+                    self.game.camera.lerp_position(self.game.alpha) -
+                    self.origin)
+            ) - scaled_size / 2,
+            scaled_size
+        )
+
+    def get_rect(self) -> Optional[Rect]:
+        self._follow_camera()
+        if self._cache is None:
+            return None
+
+        return self._cache.get_rect(
+            topleft=self._cache_pos).union(self._cam_rect())
 
     def raw_draw(self):
-        pos = self.display.size - self.size
+        self._follow_camera()
+        if self._cache is None:
+            self._build_cache()
 
-        for y in range(self.map.iso_size_y):
-            for x in range(self.map.iso_size_x):
-                world_coords = pos + (self.map.iso_to_cartesian(
-                    Vector2(
-                        x * self._tile_size.x,
-                        y * self._tile_size.y * 2
-                    )
-                ) / self.map.cartesian_size)
-                pygame.draw.rect(
-                    self.display.screen,
-                    self.tile_colors[self.map.map_data[x][y]],
-                    Rect(world_coords, self._tile_size)
-                )
+        self.display.screen.blit(self._cache, self._cache_pos)
 
-        scaled_size = Vector2(
-            self.display.size.x * self.scale_ratio.x,
-            self.display.size.y * self.scale_ratio.y
-        )
         pygame.draw.rect(
             self.display.screen,
             self.cam_color,
-            Rect(
-                self.world_to_mini(
-                    self.map.iso_to_cartesian(self.game.camera.position)
-                ) - scaled_size / 2,
-                scaled_size
-            ),
+            self._cam_rect(),
             2
         )
-
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import os
+import hashlib
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pygame
+
+from pygame import Surface
+
+from .utils import tint
+
+
+# baked strips live here, safe to delete, they get baked again
+CACHE_DIR = '.cache/palettes'
+
+
+def tile_colors(delta: int) -> List[Tuple[float, float, float]]:
+    """Color of each of the delta tile ids, the map tints its tiles with
+    them and the minimap draws them as they are
+    """
+    return [
+        (0, (i * 255) / delta, (max(0, i - 50) * 255) / delta)
+        for i in range(delta)
+    ]
+
+
+class TilePalette:
+    """Tinted variants of a tile, one per color, at any size asked for.
+
+    Variants are baked into a strip image under ``cache_dir`` named
+    after a hash of the tile pixels, the size and the colors, so later
+    launches only load the strip while a changed tileset or palette
+    bakes a new one.
+    """
+
+    def __init__(
+        self,
+        tile: Optional[Surface],
+        colors: Sequence[Tuple[float, float, float]],
+        cache_dir: str = CACHE_DIR
+    ):
+        self.colors = list(colors)
+        self.cache_dir = cache_dir
+
+        self._variants: Dict[Tuple[int, int], List[Surface]] = {}
+        self.tile = tile
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    @property
+    def tile(self) -> Optional[Surface]:
+        return self._tile
+
+    @tile.setter
+    def tile(self, tile: Optional[Surface]):
+        # another tile bakes to other variants under another key
+        self._tile = tile
+        self._tile_hash = None
+        self._variants.clear()
+
+    def key(self, size: Tuple[int, int]) -> str:
+        if self._tile_hash is None:
+            self._tile_hash = hashlib.sha1(
+                pygame.image.tobytes(self.tile, 'RGBA')).hexdigest()
+
+        params = repr((self.tile.get_size(), tuple(size), self.colors))
+        return hashlib.sha1(
+            (self._tile_hash + params).encode()).hexdigest()[:20]
+
+    def path(self, size: Tuple[int, int]) -> str:
+        return os.path.join(self.cache_dir, self.key(size) + '.png')
+
+    def variants(
+        self,
+        size: Optional[Tuple[int, int]] = None
+    ) -> List[Surface]:
+        """Tile tinted with every color, scaled to size (the tile's own
+        size if None), the list index is the tile id
+        """
+        size = tuple(size or self.tile.get_size())
+        variants = self._variants.get(size)
+        if variants is not None:
+            return variants
+
+        width, height = size
+        strip = self._load(size)
+        if strip is None:
+            strip = self._bake(size)
+            self._save(strip, size)
+
+        if pygame.display.get_surface() is not None:
+            strip = strip.convert_alpha()
+
+        variants = [
+            strip.subsurface((i * width, 0, width, height))
+            for i in range(len(self.colors))
+        ]
+        self._variants[size] = variants
+        return variants
+
+    def _load(self, size: Tuple[int, int]) -> Optional[Surface]:
+        path = self.path(size)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            strip = pygame.image.load(path)
+        except pygame.error:
+            return None
+
+        # not what this key bakes to, bake it again
+        if strip.get_size() != (size[0] * len(self.colors), size[1]):
+            return None
+
+        return strip
+
+    def _bake(self, size: Tuple[int, int]) -> Surface:
+        width, height = size
+        # variants are flat colors, nearest neighbour keeps the alpha edges
+        # hard so neighbouring tiles still meet without seams
+        tile = self.tile
+        if tile.get_size() != size:
+            tile = pygame.transform.scale(tile, size)
+
+        strip = Surface((width * len(self.colors), height), pygame.SRCALPHA)
+        strip.fill((0, 0, 0, 0))
+        # max onto the cleared strip copies the pixels, alpha included
+        strip.blits(
+            [(tint(tile, color), (i * width, 0), None, pygame.BLEND_RGBA_MAX)
+             for i, color in enumerate(self.colors)],
+            doreturn=False
+        )
+        return strip
+
+    def _save(self, strip: Surface, size: Tuple[int, int]):
+        # written next to the final name and moved over it, so readers
+        # never see half a strip
+        path = self.path(size)
+        tmp = f'{path[:-4]}.{os.getpid()}.tmp.png'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pygame.image.save(strip, tmp)
+            os.replace(tmp, path)
+        except (OSError, pygame.error):
+            # read only installs still work, they bake every launch
+            pass
+
+    def clear(self):
+        self._variants.clear()
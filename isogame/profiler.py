@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import json
+
+from collections import deque
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import pygame
+
+from pygame import Rect, Surface
+
+from .ecs import on_call
+from .display import Drawable, LAYER_OVERLAY
+
+
+class Profiler:
+    """Wall time spans of the last ``window`` frames. Levels and the
+    display only record into it while it's attached to them, see
+    ``Game.profile``, otherwise it costs nothing.
+
+    Spans are (name, category, start, end) with perf_counter times,
+    categories are the on_call flag for handlers, 'flag' for a whole
+    perform_calls pass, 'culled' for a pass over the visible entities,
+    'raw_draw', 'sort', 'present' and 'frame'.
+    """
+
+    def __init__(self, window: int = 120):
+        self.window = window
+        self.frames = deque(maxlen=window)
+
+        self._frame: List[Tuple[str, str, float, float]] = []
+        self._frame_start = None
+        self._names: Dict[tuple, str] = {}
+
+    def name(self, comp_type: type, method: str) -> str:
+        key = (comp_type, method)
+        name = self._names.get(key)
+        if name is None:
+            name = f'{comp_type.__name__}.{method}'
+            self._names[key] = name
+
+        return name
+
+    def record(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        end: Optional[float] = None
+    ):
+        self._frame.append(
+            (name, category, start, perf_counter() if end is None else end))
+
+    def begin_frame(self):
+        self._frame_start = perf_counter()
+
+    def end_frame(self):
+        if self._frame_start is not None:
+            self.record('frame', 'frame', self._frame_start)
+
+        self.frames.append(self._frame)
+        self._frame = []
+        self._frame_start = None
+
+    def clear(self):
+        self.frames.clear()
+        self._frame = []
+
+    def averages(self, category: Optional[str] = None) -> Dict[str, float]:
+        """Milliseconds per frame spent on each span name over the window
+        """
+        totals = {}
+        for frame in self.frames:
+            for name, cat, start, end in frame:
+                if category is None or cat == category:
+                    totals[name] = totals.get(name, 0.) + end - start
+
+        frames = max(1, len(self.frames))
+        return {
+            name: 1000 * total / frames
+            for name, total in totals.items()
+        }
+
+    def report(self, top: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(name, ms per frame) of the costliest spans first, whole frames
+        and perform_calls passes left out as they contain the rest.
+        """
+        totals = {}
+        for frame in self.frames:
+            for name, cat, start, end in frame:
+                if cat not in ('frame', 'flag'):
+                    totals[name] = totals.get(name, 0.) + end - start
+
+        frames = max(1, len(self.frames))
+        ranked = sorted(
+            ((name, 1000 * total / frames) for name, total in totals.items()),
+            key=lambda item: item[1], reverse=True
+        )
+        return ranked[:top] if top else ranked
+
+    def chrome_trace(self) -> dict:
+        """Window as Chrome trace_event JSON, loads in chrome://tracing
+        or Perfetto.
+        """
+        events = [
+            {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': 0,
+                'tid': 0
+            }
+            for frame in self.frames
+            for name, category, start, end in frame
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class ProfilerOverlay(Drawable):
+    """Costliest spans of the game profiler drawn on the top left corner,
+    the text only gets rendered again every ``refresh`` frames.
+    """
+
+    layer = LAYER_OVERLAY
+
+    def __init__(self, entity, top: int = 12, refresh: int = 30):
+        super().__init__(entity)
+        self.profiler = self.game.profiler
+        self.top = top
+        self.refresh = refresh
+
+        self.color = (255, 255, 255)
+        self.background = (0, 0, 0, 180)
+        self.font = pygame.font.Font(None, 18)
+
+        self._surf = None
+        self._frames = 0
+
+    @on_call('draw')
+    def draw(self):
+        if self._surf is None or self._frames % self.refresh == 0:
+            self._render()
+            self.display.invalidate(self._surf.get_rect())
+
+        self._frames += 1
+        self.display.draw(self)
+
+    def _render(self):
+        lines = [f'frame {self.game.stats.work_ms:6.2f} ms']
+        lines += [
+            f'{ms:6.2f} ms  {name}'
+            for name, ms in self.profiler.report(self.top)
+        ]
+        text = [self.font.render(line, True, self.color) for line in lines]
+
+        height = self.font.get_linesize()
+        self._surf = Surface(
+            (max(line.get_width() for line in text) + 8,
+             height * len(text) + 8),
+            pygame.SRCALPHA
+        )
+        self._surf.fill(self.background)
+        self._surf.blits(
+            [(line, (4, 4 + i * height)) for i, line in enumerate(text)],
+            doreturn=False
+        )
+
+    def get_rect(self) -> Rect:
+        return self._surf.get_rect()
+
+    def raw_draw(self):
+        self.display.screen.blit(self._surf, (0, 0))
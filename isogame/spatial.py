@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+from math import floor
+from typing import Dict, List, Set, Tuple
+
+from pygame.math import Vector2
+
+
+class SpatialHash:
+    """Uniform grid over iso coords bucketing entities by their position,
+    ``Entity.position`` keeps it current as entities move.
+
+    cell_size: side of the grid cells in iso tiles, queries look at every
+    cell the query box touches so it should be around the size of the
+    usual query
+    """
+
+    def __init__(self, cell_size: float = 8):
+        self.cell_size = cell_size
+
+        self._cells: Dict['Entity', Tuple[int, int]] = {}
+        self._buckets: Dict[Tuple[int, int], Set['Entity']] = {}
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __contains__(self, entity) -> bool:
+        return entity in self._cells
+
+    def cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (floor(x / self.cell_size), floor(y / self.cell_size))
+
+    def update(self, entity, pos: Vector2):
+        """Insert the entity or move it to the bucket of its new position
+        """
+        cell = self.cell(pos.x, pos.y)
+        prev = self._cells.get(entity)
+        if prev == cell:
+            return
+
+        if prev is not None:
+            bucket = self._buckets[prev]
+            bucket.discard(entity)
+            if not bucket:
+                del self._buckets[prev]
+
+        self._cells[entity] = cell
+        bucket = self._buckets.get(cell)
+        if bucket is None:
+            self._buckets[cell] = {entity}
+        else:
+            bucket.add(entity)
+
+    def remove(self, entity):
+        cell = self._cells.pop(entity, None)
+        if cell is None:
+            return
+
+        bucket = self._buckets[cell]
+        bucket.discard(entity)
+        if not bucket:
+            del self._buckets[cell]
+
+    def _candidates(self, x_begin, y_begin, x_end, y_end):
+        cx_begin, cy_begin = self.cell(x_begin, y_begin)
+        cx_end, cy_end = self.cell(x_end, y_end)
+
+        # sparse worlds, walking the buckets beats walking empty cells
+        if (cx_end - cx_begin + 1) * (cy_end - cy_begin + 1) > len(self._buckets):
+            for (cx, cy), bucket in self._buckets.items():
+                if cx_begin <= cx <= cx_end and cy_begin <= cy <= cy_end:
+                    yield from bucket
+            return
+
+        buckets = self._buckets
+        for cx in range(cx_begin, cx_end + 1):
+            for cy in range(cy_begin, cy_end + 1):
+                bucket = buckets.get((cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def region(self, x: float, y: float, width: float, height: float) -> List['Entity']:
+        """Entities with x <= position.x < x + width and the same for y
+        """
+        x_end, y_end = x + width, y + height
+        return [
+            entity
+            for entity in self._candidates(x, y, x_end, y_end)
+            if x <= entity._position.x < x_end and y <= entity._position.y < y_end
+        ]
+
+    def radius(self, center: Vector2, radius: float) -> List['Entity']:
+        """Entities at most radius iso tiles away from center
+        """
+        r2 = radius * radius
+        cx, cy = center.x, center.y
+        found = []
+        for entity in self._candidates(
+            cx - radius, cy - radius, cx + radius, cy + radius):
+            pos = entity._position
+            if (pos.x - cx) ** 2 + (pos.y - cy) ** 2 <= r2:
+                found.append(entity)
+
+        return found
+
+    def diamond(
+        self,
+        u_begin: float,
+        u_end: float,
+        v_begin: float,
+        v_end: float
+    ) -> List['Entity']:
+        """Entities with u_begin <= x + y < u_end and v_begin <= y - x <
+        v_end, an axis aligned box on screen is one of these.
+        """
+        # corners of the rhombus bound the box of cells to look at
+        x_begin = (u_begin - v_end) / 2
+        x_end = (u_end - v_begin) / 2
+        y_begin = (u_begin + v_begin) / 2
+        y_end = (u_end + v_end) / 2
+
+        found = []
+        for entity in self._candidates(x_begin, y_begin, x_end, y_end):
+            pos = entity._position
+            u, v = pos.x + pos.y, pos.y - pos.x
+            if u_begin <= u < u_end and v_begin <= v < v_end:
+                found.append(entity)
+
+        return found
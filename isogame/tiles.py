@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+import os
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def tile_dtype(delta: int) -> np.dtype:
+    """Smallest unsigned type that fits tile ids in the range (0, delta)
+    """
+    if delta <= 0x100:
+        return np.dtype(np.uint8)
+
+    if delta <= 0x10000:
+        return np.dtype(np.uint16)
+
+    raise ValueError(f'can\'t store {delta} tile ids')
+
+
+class TileGrid:
+    """Tile ids of an iso map packed in a 2d numpy array, indexed
+    ``grid[x][y]`` or ``grid[x, y]`` like the old list of lists.
+
+    size_x: map width in iso tiles
+    size_y: map height in iso tiles
+    delta: amount of different tile ids
+    data: optional initial ids with shape (size_x, size_y)
+    """
+
+    def __init__(
+        self,
+        size_x: int,
+        size_y: int,
+        delta: int,
+        data: Optional[np.ndarray] = None
+    ):
+        self.size_x = size_x
+        self.size_y = size_y
+        self.delta = delta
+        self.dtype = tile_dtype(delta)
+
+        if data is None:
+            self.data = np.zeros((size_x, size_y), dtype=self.dtype)
+
+        else:
+            assert data.shape == (size_x, size_y)
+            self.data = np.ascontiguousarray(data, dtype=self.dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.size_x and 0 <= y < self.size_y
+
+    def get(self, x: int, y: int) -> int:
+        return int(self.data[x, y])
+
+    def set(self, x: int, y: int, tile_id: int):
+        self.data[x, y] = tile_id
+
+    def region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        """View (not a copy) of the tiles inside the box, clipped to the
+        map bounds.
+        """
+        return self.data[
+            max(0, x):max(0, x + width),
+            max(0, y):max(0, y + height)
+        ]
+
+    def fill(self, x: int, y: int, width: int, height: int, tile_id: int):
+        self.region(x, y, width, height)[:] = tile_id
+
+    def mask(self, tile_id: int) -> np.ndarray:
+        return self.data == tile_id
+
+    def mask_range(self, low: int, high: int) -> np.ndarray:
+        """Tiles with low <= id < high
+        """
+        return (self.data >= low) & (self.data < high)
+
+    def count(self, tile_id: int) -> int:
+        return int(np.count_nonzero(self.data == tile_id))
+
+    def histogram(self) -> np.ndarray:
+        """Amount of tiles of each id, indexed by id
+        """
+        return np.bincount(self.data.ravel(), minlength=self.delta)
+
+
+class ChunkPager:
+    """Keeps evicted chunks that were modified as ``.npy`` files, one
+    per chunk, so they survive being dropped from memory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, cx: int, cy: int) -> str:
+        return os.path.join(self.directory, f'{cx}_{cy}.npy')
+
+    def load(self, cx: int, cy: int) -> Optional[np.ndarray]:
+        path = self._path(cx, cy)
+        if not os.path.exists(path):
+            return None
+
+        return np.load(path)
+
+    def store(self, cx: int, cy: int, chunk: np.ndarray):
+        np.save(self._path(cx, cy), chunk)
+
+
+class ChunkedTiles:
+    """Tile ids split in square chunks that only exist in memory while
+    needed, same accessor api as ``TileGrid``.
+
+    Missing chunks come from the pager if it has them, else from
+    ``generate(cx, cy)`` which must return a (chunk_size, chunk_size)
+    array and gets called from a background thread for ``request``-ed
+    chunks. Chunks past ``max_chunks`` get evicted least recently used
+    first, dirty ones go to the pager on the way out. Without a pager
+    dirty chunks are never evicted, edits would be lost otherwise, so
+    an edited world can grow past ``max_chunks``.
+
+    size_x, size_y: map bounds in iso tiles, None for no bound
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        delta: int,
+        generate: Callable[[int, int], np.ndarray],
+        size_x: Optional[int] = None,
+        size_y: Optional[int] = None,
+        max_chunks: int = 1024,
+        pager: Optional[ChunkPager] = None
+    ):
+        self.chunk_size = chunk_size
+        self.delta = delta
+        self.dtype = tile_dtype(delta)
+        self.generate = generate
+        self.size_x = size_x
+        self.size_y = size_y
+        self.max_chunks = max_chunks
+        self.pager = pager
+
+        self.dirty = set()
+
+        self._chunks: 'OrderedDict[Tuple[int, int], np.ndarray]' = OrderedDict()
+        self._pending: Dict[Tuple[int, int], Future] = {}
+        self._worker = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+    def _load(self, cx: int, cy: int) -> np.ndarray:
+        chunk = None
+        if self.pager:
+            chunk = self.pager.load(cx, cy)
+
+        if chunk is None:
+            chunk = self.generate(cx, cy)
+
+        return np.asarray(chunk, dtype=self.dtype)
+
+    def _install(self, key: Tuple[int, int], chunk: np.ndarray):
+        self._chunks[key] = chunk
+        if len(self._chunks) <= self.max_chunks:
+            return
+
+        # least recently used first, skipping the ones evict keeps
+        for old in list(self._chunks):
+            if len(self._chunks) <= self.max_chunks:
+                break
+            if old != key:
+                self.evict(*old)
+
+    def loaded(self, cx: int, cy: int) -> bool:
+        return (cx, cy) in self._chunks
+
+    def chunk(self, cx: int, cy: int) -> np.ndarray:
+        """Chunk array, loads it right away if it isn't in memory
+        """
+        key = (cx, cy)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+
+        future = self._pending.pop(key, None)
+        chunk = future.result() if future else self._load(cx, cy)
+        self._install(key, chunk)
+        return chunk
+
+    def request(self, cx: int, cy: int):
+        """Load a chunk on the background worker, it becomes available
+        once ``poll`` sees it finished.
+        """
+        key = (cx, cy)
+        if key in self._chunks or key in self._pending:
+            return
+
+        self._pending[key] = self._worker.submit(self._load, cx, cy)
+
+    def poll(self):
+        for key, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[key]
+                self._install(key, future.result())
+
+    def evict(self, cx: int, cy: int):
+        """Drop a chunk from memory, dirty chunks stay while there's no
+        pager to keep them
+        """
+        key = (cx, cy)
+        if key not in self._chunks:
+            return
+
+        if key in self.dirty:
+            if not self.pager:
+                return
+
+            self.pager.store(cx, cy, self._chunks[key])
+            self.dirty.discard(key)
+
+        del self._chunks[key]
+
+    def evict_outside(self, cx_begin: int, cy_begin: int, cx_end: int, cy_end: int):
+        """Drop every chunk outside of the chunk box, end exclusive
+        """
+        for cx, cy in list(self._chunks):
+            if not (cx_begin <= cx < cx_end and cy_begin <= cy < cy_end):
+                self.evict(cx, cy)
+
+    def flush(self):
+        """Page out every dirty chunk without evicting it, without a
+        pager they stay dirty
+        """
+        if self.pager:
+            for cx, cy in self.dirty:
+                self.pager.store(cx, cy, self._chunks[(cx, cy)])
+            self.dirty.clear()
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return ((self.size_x is None or 0 <= x < self.size_x) and
+                (self.size_y is None or 0 <= y < self.size_y))
+
+    def get(self, x: int, y: int) -> int:
+        n = self.chunk_size
+        return int(self.chunk(x // n, y // n)[x % n, y % n])
+
+    def set(self, x: int, y: int, tile_id: int):
+        n = self.chunk_size
+        self.chunk(x // n, y // n)[x % n, y % n] = tile_id
+        self.dirty.add((x // n, y // n))
+
+    def _clip(self, x: int, y: int, width: int, height: int):
+        x_end, y_end = x + width, y + height
+        if self.size_x is not None:
+            x, x_end = max(0, x), min(self.size_x, x_end)
+        if self.size_y is not None:
+            y, y_end = max(0, y), min(self.size_y, y_end)
+        return x, y, max(x, x_end), max(y, y_end)
+
+    def _boxes(self, x: int, y: int, x_end: int, y_end: int):
+        # (cx, cy, box slices in the chunk, box slices in the region)
+        n = self.chunk_size
+        for cx in range(x // n, (x_end - 1) // n + 1):
+            for cy in range(y // n, (y_end - 1) // n + 1):
+                bx, by = max(x, cx * n), max(y, cy * n)
+                bx_end = min(x_end, (cx + 1) * n)
+                by_end = min(y_end, (cy + 1) * n)
+                yield cx, cy, (
+                    slice(bx - cx * n, bx_end - cx * n),
+                    slice(by - cy * n, by_end - cy * n)
+                ), (
+                    slice(bx - x, bx_end - x),
+                    slice(by - y, by_end - y)
+                )
+
+    def region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        """Copy of the tiles inside the box, clipped to the map bounds.
+        """
+        x, y, x_end, y_end = self._clip(x, y, width, height)
+        out = np.empty((x_end - x, y_end - y), dtype=self.dtype)
+        if out.size:
+            for cx, cy, src, dst in self._boxes(x, y, x_end, y_end):
+                out[dst] = self.chunk(cx, cy)[src]
+
+        return out
+
+    def fill(self, x: int, y: int, width: int, height: int, tile_id: int):
+        x, y, x_end, y_end = self._clip(x, y, width, height)
+        if x == x_end or y == y_end:
+            return
+
+        for cx, cy, src, _ in self._boxes(x, y, x_end, y_end):
+            self.chunk(cx, cy)[src] = tile_id
+            self.dirty.add((cx, cy))
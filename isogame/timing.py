@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+
+class FrameStats:
+    """Rolling window of frame timings, filled in by the game loop.
+
+    window: amount of frames the averages are taken over
+    """
+
+    def __init__(self, window: int = 120):
+        self.window = window
+
+        self.frames = 0
+        self.ticks = 0
+
+        self._frame_times = deque(maxlen=window)  # start to start
+        self._work_times = deque(maxlen=window)  # without the sleep
+        self._frame_ticks = deque(maxlen=window)
+
+    def record(self, frame_time: float, work_time: float, ticks: int):
+        self.frames += 1
+        self.ticks += ticks
+
+        self._frame_times.append(frame_time)
+        self._work_times.append(work_time)
+        self._frame_ticks.append(ticks)
+
+    @property
+    def fps(self) -> float:
+        total = sum(self._frame_times)
+        return len(self._frame_times) / total if total else 0.
+
+    @property
+    def tick_rate(self) -> float:
+        """Simulation ticks per second actually run
+        """
+        total = sum(self._frame_times)
+        return sum(self._frame_ticks) / total if total else 0.
+
+    @property
+    def frame_ms(self) -> float:
+        if not self._frame_times:
+            return 0.
+        return 1000 * sum(self._frame_times) / len(self._frame_times)
+
+    @property
+    def work_ms(self) -> float:
+        """Average time spent ticking and drawing, sleeps left out
+        """
+        if not self._work_times:
+            return 0.
+        return 1000 * sum(self._work_times) / len(self._work_times)
+
+    @property
+    def max_work_ms(self) -> float:
+        return 1000 * max(self._work_times, default=0.)
+
+    def summary(self) -> dict:
+        return {
+            'frames': self.frames,
+            'ticks': self.ticks,
+            'fps': self.fps,
+            'tick_rate': self.tick_rate,
+            'frame_ms': self.frame_ms,
+            'work_ms': self.work_ms,
+            'max_work_ms': self.max_work_ms
+        }
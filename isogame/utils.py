@@ -2,6 +2,7 @@
 
 import copy
 
+import numpy as np
 import pygame
 
 from pygame import Vector2
@@ -54,3 +55,28 @@ def diagonal_box_iter(start_x: int, start_y: int, width: int, height: int):
 
         for i, x, y in diagonal_iter(start_x, start_y, width):
             yield i, j, x, y
+
+
+def diamond_cells(u_begin: int, u_end: int, v_begin: int, v_end: int):
+    """
+    Every iso cell (x, y) with u = x + y in the range [u_begin, u_end)
+    and v = y - x in the range [v_begin, v_end), as an (N, 2) int array.
+
+    u and v are the cartesian axes scaled to cell units, so a box in
+    (u, v) is a screen aligned rectangle and the cells come out sorted top
+    to bottom (by v) then left to right (by u), u and v of a cell always
+    share parity:
+
+     __0_1_2_3_4_5_6_7 u
+    0| * - * - * - * -
+    1| - * - * - * - *
+    2| * - * - * - * -
+    v
+    """
+    u, v = np.meshgrid(
+        np.arange(u_begin, u_end),
+        np.arange(v_begin, v_end)
+    )
+    same_parity = ((u - v) & 1) == 0
+    u, v = u[same_parity], v[same_parity]
+    return np.stack(((u - v) // 2, (u + v) // 2), axis=1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""Binary world files.
+
+A fixed size header followed by the tile ids of every chunk, chunks are
+laid out one after the other (cx major) and each one is a full
+chunk_size x chunk_size block indexed [x, y], even on the map edges.
+The file gets accessed through ``mmap`` so opening it doesn't read any
+tile, only the chunks that get touched are paged in.
+"""
+
+import os
+import mmap
+import struct
+
+from math import ceil
+
+import numpy as np
+
+from .tiles import tile_dtype
+
+
+MAGIC = b'ISOW'
+VERSION = 1
+
+# magic, version, bytes per tile, seed, size x, size y, map delta,
+# chunk size
+HEADER = struct.Struct('<4sHHqIIII')
+DATA_OFFSET = 64
+
+
+class WorldFormatError(Exception):
+    ...
+
+
+class WorldFile:
+    """Open world file, use ``create`` to make a new one.
+
+    Implements the pager interface (``load`` / ``store``) so it can back
+    a ``ChunkedTiles`` directly.
+    """
+
+    def __init__(self, path: str, writable: bool = True):
+        self.path = path
+        self.writable = writable
+
+        self._file = open(path, 'r+b' if writable else 'rb')
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise WorldFormatError(f'{path}: truncated header')
+
+        (magic, version, itemsize, self.seed, self.size_x, self.size_y,
+         self.delta, self.chunk_size) = HEADER.unpack(header)
+
+        if magic != MAGIC:
+            raise WorldFormatError(f'{path}: not a world file')
+
+        if version != VERSION:
+            raise WorldFormatError(
+                f'{path}: unsupported world version {version}')
+
+        self.dtype = tile_dtype(self.delta)
+        assert self.dtype.itemsize == itemsize
+
+        self.chunks_x = ceil(self.size_x / self.chunk_size)
+        self.chunks_y = ceil(self.size_y / self.chunk_size)
+        self.chunk_bytes = self.chunk_size * self.chunk_size * itemsize
+
+        size = DATA_OFFSET + self.chunks_x * self.chunks_y * self.chunk_bytes
+        if os.fstat(self._file.fileno()).st_size < size:
+            raise WorldFormatError(f'{path}: truncated tile data')
+
+        self._mmap = mmap.mmap(
+            self._file.fileno(), size,
+            access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        )
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        seed: int,
+        size_x: int,
+        size_y: int,
+        delta: int,
+        chunk_size: int
+    ) -> 'WorldFile':
+        """New world file with every tile set to 0, the tile data is
+        left as a hole in the file so even huge worlds are cheap to create.
+        """
+        chunks = ceil(size_x / chunk_size) * ceil(size_y / chunk_size)
+        itemsize = tile_dtype(delta).itemsize
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, itemsize,
+                seed, size_x, size_y, delta, chunk_size
+            ))
+            f.truncate(DATA_OFFSET + chunks * chunk_size * chunk_size * itemsize)
+
+        return cls(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _offset(self, cx: int, cy: int) -> int:
+        if not (0 <= cx < self.chunks_x and 0 <= cy < self.chunks_y):
+            raise IndexError(f'chunk {(cx, cy)} out of the world bounds')
+
+        return DATA_OFFSET + (cx * self.chunks_y + cy) * self.chunk_bytes
+
+    def read_chunk(self, cx: int, cy: int) -> np.ndarray:
+        """Zero copy view of a chunk straight into the mapped file. The
+        map can't be closed while a view is alive, ``close`` raises
+        BufferError until they're all gone, use ``load`` for a copy that
+        outlives the file.
+        """
+        n = self.chunk_size
+        return np.frombuffer(
+            self._mmap, dtype=self.dtype, count=n * n,
+            offset=self._offset(cx, cy)
+        ).reshape((n, n))
+
+    def write_chunk(self, cx: int, cy: int, chunk: np.ndarray):
+        """Chunks on the map edges can be passed clipped to the map
+        bounds, the rest of the block is left as is.
+        """
+        n = self.chunk_size
+        view = np.ndarray(
+            (n, n), dtype=self.dtype,
+            buffer=self._mmap, offset=self._offset(cx, cy)
+        )
+        view[:chunk.shape[0], :chunk.shape[1]] = chunk
+
+    def load(self, cx: int, cy: int) -> np.ndarray:
+        return self.read_chunk(cx, cy).copy()
+
+    def store(self, cx: int, cy: int, chunk: np.ndarray):
+        self.write_chunk(cx, cy, chunk)
+
+    def flush(self):
+        if self.writable:
+            self._mmap.flush()
+
+    def close(self):
+        """Flush and close, BufferError while ``read_chunk`` views are
+        still around
+        """
+        if self._mmap.closed:
+            return
+
+        self.flush()
+        self._mmap.close()
+        self._file.close()
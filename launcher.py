@@ -1,7 +1,53 @@
 #!/usr/bin/env python3
 
-from isogame.ecs import run_game
+import random
+import argparse
+
+from isogame.ecs import init_game, run_headless
+from isogame.input import InputReplay
 
 
 if __name__ == '__main__':
-    run_game()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--headless', type=int, metavar='TICKS',
+        help='simulate TICKS updates without a window and exit')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--profile', metavar='TRACE',
+        help='show the profiler overlay and save a chrome trace on exit')
+    parser.add_argument(
+        '--record', metavar='INPUT',
+        help='save the input of every frame to INPUT, the map comes from '
+             '--seed so the session can be replayed')
+    parser.add_argument(
+        '--replay', metavar='INPUT',
+        help='play back a session saved with --record and exit')
+    args = parser.parse_args()
+
+    if args.headless:
+        result = run_headless(args.headless, seed=args.seed)
+        print(
+            f'{result["ticks"]} ticks in {result["seconds"]:.3f}s, '
+            f'{result["ticks_per_second"]:.0f} ticks/s')
+
+    else:
+        # recorded sessions only replay the same way on the same map
+        if args.replay:
+            random.seed(InputReplay(args.replay).seed)
+        elif args.record:
+            random.seed(args.seed)
+
+        game = init_game()
+        if args.profile:
+            game.profile(overlay=True)
+
+        if args.replay:
+            game.input.play(args.replay)
+        elif args.record:
+            game.input.record(args.record, seed=args.seed)
+
+        game.run()
+
+        if args.profile:
+            game.profiler.export_chrome_trace(args.profile)
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 
+import os
 
 import pygame
 import pytest
 
-from isogame.map import Map
+from isogame.ecs import init_game
 
 
 @pytest.fixture(scope='session')
-def isometric_map():
+def game():
 
-    cartesian_size = 64
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 
-    pygame.init()
-    yield Map(None, 10, 10, cartesian_size)
+    yield init_game()
+    pygame.quit()
+
+
+@pytest.fixture(scope='session')
+def isometric_map(game):
+
+    yield game.map
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import json
+
+import pygame
+
+from isogame.assets import Assets
+
+
+def test_images_are_shared_and_converted(game):
+
+    assets = Assets()
+    tile = assets.image('res/tile_medium.png')
+
+    assert assets.image('res/tile_medium.png') is tile
+    assert len(assets) == 1
+
+    screen = pygame.display.get_surface()
+    assert tile.get_bitsize() == screen.get_bitsize()
+    assert tile.get_flags() & pygame.SRCALPHA
+
+    opaque = assets.image('res/tile_medium.png', alpha=False)
+    assert not opaque.get_flags() & pygame.SRCALPHA
+
+
+def test_preload_manifest(game, tmp_path):
+
+    manifest = tmp_path / 'assets.json'
+    manifest.write_text(json.dumps(
+        {'images': ['res/tile_medium.png', 'res/humanoid_medium.png']}))
+
+    assets = Assets()
+    assets.preload_manifest(str(manifest)).result(timeout=10)
+    try:
+        humanoid = assets.image('res/humanoid_medium.png')
+        assert humanoid.get_size() == (64, 128)
+        assert assets.preload(['res/humanoid_medium.png']).done()
+
+    finally:
+        assets.close()
+
+
+def test_images_decode_once_and_convert_late(game, monkeypatch):
+
+    loads = []
+    load = pygame.image.load
+
+    def counting_load(path):
+        loads.append(path)
+        return load(path)
+
+    monkeypatch.setattr(pygame.image, 'load', counting_load)
+    assets = Assets()
+
+    # no display yet, the decoded image gets handed out unconverted
+    with monkeypatch.context() as m:
+        m.setattr(pygame.display, 'get_surface', lambda: None)
+        early = assets.image('res/tile_medium.png')
+        assert len(assets) == 0
+
+    # converted once the display is there, both alpha modes from the one
+    # decode
+    tile = assets.image('res/tile_medium.png')
+    opaque = assets.image('res/tile_medium.png', alpha=False)
+    assert tile is not early
+    assert tile.get_bitsize() == pygame.display.get_surface().get_bitsize()
+    assert not opaque.get_flags() & pygame.SRCALPHA
+    assert loads == ['res/tile_medium.png']
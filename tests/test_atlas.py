@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import pygame
+
+from pygame import Rect
+from pygame.math import Vector2
+
+from isogame.assets import Assets
+from isogame.atlas import build, pack
+from isogame.humanoid import Humanoid
+
+
+def test_pack_keeps_frames_apart():
+
+    sizes = [(64, 128)] * 8 + [(128, 64), (64, 32), (8, 4)]
+    (width, height), positions = pack(sizes)
+
+    rects = [Rect(pos, size) for pos, size in zip(positions, sizes)]
+    sheet = Rect(0, 0, width, height)
+    for i, rect in enumerate(rects):
+        assert sheet.contains(rect)
+        assert rect.collidelist(rects[i + 1:]) == -1
+
+
+def test_atlas_frames_match_sources(game, tmp_path):
+
+    index_path = str(tmp_path / 'atlas.json')
+    build({
+        'turned': 'res/blender/render%d.png',
+        'tile': 'res/tile_medium.png'
+    }, index_path)
+
+    atlas = Assets().atlas(index_path)
+    assert len(atlas.frames('turned')) == 8
+    assert 'tile' in atlas
+
+    for i in range(8):
+        source = pygame.image.load(f'res/blender/render{i}.png')
+        assert (pygame.image.tostring(atlas.subsurface('turned', i), 'RGBA') ==
+                pygame.image.tostring(source, 'RGBA'))
+
+
+def test_turned_humanoid_faces_its_way(game):
+
+    display = game.display
+    entity = game.level.spawn('turned')
+    humanoid = entity.add_component(
+        Humanoid, Vector2(game.camera.position), 'humanoid_render')
+
+    try:
+        entity.position = Vector2(game.camera.position)
+        entity.prev_position = entity.position - Vector2(0, 1)
+        game.frame()
+        assert humanoid.facing == 2
+
+        # only the frame changes, dirty rects still have to redraw it
+        entity.prev_position = entity.position - Vector2(1, 0)
+        game.frame()
+        assert humanoid.facing == 0
+        dirty = display.screen.copy()
+
+        display.invalidate()
+        game.frame()
+        assert (pygame.image.tostring(dirty, 'RGB') ==
+                pygame.image.tostring(display.screen, 'RGB'))
+
+    finally:
+        game.level.destroy('turned')
+        display.invalidate()
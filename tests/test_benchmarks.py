@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import json
+
+from benchmarks.suite import compare, main
+
+
+def results(**medians):
+    return {'results': {
+        name: {'median_ms': median} for name, median in medians.items()}}
+
+
+def test_compare_flags_regressions(tmp_path):
+
+    baseline = results(draw=10., tick=1., spawn=5.)
+    current = results(draw=12., tick=0.5, spawn=5.2, new=3.)
+
+    assert compare(baseline, current, 0.1) == [('draw', 10., 12., 1.2)]
+    assert compare(baseline, current, 0.25) == []
+
+    paths = []
+    for name, data in (('base', baseline), ('current', current)):
+        path = tmp_path / f'{name}.json'
+        path.write_text(json.dumps(data))
+        paths.append(str(path))
+
+    assert main(['compare', *paths]) == 1
+    assert main(['compare', *paths, '--threshold', '0.25']) == 0
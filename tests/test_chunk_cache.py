@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+from pygame import Surface
+
+from isogame.chunks import ChunkCache, surface_bytes
+
+
+def test_chunk_cache_lru_eviction():
+
+    renders = []
+
+    def render(cx, cy):
+        renders.append((cx, cy))
+        return Surface((16, 8))
+
+    chunk_bytes = surface_bytes(Surface((16, 8)))
+    cache = ChunkCache(render, chunk_bytes * 2)
+
+    cache.get(0, 0)
+    cache.get(1, 0)
+    cache.get(0, 0)  # hit, (1, 0) is now the oldest
+    cache.get(2, 0)
+
+    assert renders == [(0, 0), (1, 0), (2, 0)]
+    assert (0, 0) in cache and (2, 0) in cache
+    assert (1, 0) not in cache
+    assert cache.bytes == chunk_bytes * 2
+
+
+def test_chunk_cache_invalidate():
+
+    renders = []
+
+    def render(cx, cy):
+        renders.append((cx, cy))
+        return Surface((16, 8))
+
+    cache = ChunkCache(render, 1024 * 1024)
+
+    cache.get(3, 4)
+    cache.invalidate(3, 4)
+    cache.get(3, 4)
+
+    assert renders == [(3, 4), (3, 4)]
+    assert len(cache) == 1
+
+
+def test_chunk_cache_levels():
+
+    renders = []
+
+    def render(cx, cy, level=0):
+        renders.append((cx, cy, level))
+        return Surface((16 >> level, 8 >> level))
+
+    cache = ChunkCache(render, 1024 * 1024)
+
+    cache.get(0, 0)
+    cache.get(0, 0, 1)
+    assert (0, 0) in cache and (0, 0, 1) in cache
+
+    # tiles changed, every level renders again
+    cache.invalidate(0, 0)
+    assert len(cache) == 0 and cache.bytes == 0
+
+    cache.get(0, 0, 1)
+    assert renders == [(0, 0, 0), (0, 0, 1), (0, 0, 1)]
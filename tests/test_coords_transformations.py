@@ -2,6 +2,8 @@
 
 import random
 
+import numpy as np
+
 from pygame.math import Vector2
 
 
@@ -27,3 +29,35 @@ def test_transformations_random(isometric_map):
 
     assert iso_coords == isometric_map.cartesian_to_iso(
         isometric_map.iso_to_cartesian(iso_coords))
+
+
+def test_transformations_batch(isometric_map):
+
+    iso_coords = np.array([
+        [random.randint(-1000, 1000), random.randint(-1000, 1000)]
+        for _ in range(100)
+    ])
+
+    world_coords = isometric_map.iso_to_cartesian_array(iso_coords)
+
+    assert world_coords.shape == (100, 2)
+    for iso, world in zip(iso_coords, world_coords):
+        assert Vector2(*world) == isometric_map.iso_to_cartesian(
+            Vector2(*iso))
+
+    assert np.array_equal(
+        isometric_map.cartesian_to_iso_array(world_coords), iso_coords)
+
+
+def test_pick_tiles(isometric_map):
+
+    tiles = np.array([[0, 0], [3, 7], [-2, 5]])
+    world_coords = isometric_map.iso_to_cartesian_array(tiles)
+
+    # center of each tile image and a point near its left corner
+    tile_size = isometric_map.tile_size
+    center = world_coords + (tile_size.x / 2, tile_size.y / 2)
+    left = world_coords + (2, tile_size.y / 2)
+
+    assert np.array_equal(isometric_map.pick_tiles(center), tiles)
+    assert np.array_equal(isometric_map.pick_tiles(left), tiles)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pygame
+import pytest
+
+from pygame import Rect, Surface
+from pygame.math import Vector2
+
+from isogame.map import Map
+from isogame.display import (
+    merge_rects, order_key, Camera, LAYER_ENTITIES, LAYER_UI, ZOOM_LEVELS)
+
+
+def test_merge_rects():
+
+    merged = merge_rects([
+        Rect(0, 0, 10, 10),
+        Rect(20, 0, 10, 10),
+        Rect(5, 5, 20, 2),
+        Rect(100, 100, 1, 1)
+    ])
+
+    assert sorted(merged) == [Rect(0, 0, 30, 10), Rect(100, 100, 1, 1)]
+
+
+def finish_streaming(_map):
+    for future in list(_map.map_data._pending.values()):
+        future.result()
+    _map.map_data.poll()
+
+
+@pytest.fixture(params=['bounded', 'streaming'])
+def terrain(request, game):
+
+    if request.param == 'bounded':
+        yield game.map
+        return
+
+    # a streaming map drawn in place of the session one
+    game.level.remove_calls([game.map])
+    streamed = game.level.spawn('streamed').add_component(
+        Map, None, None, 64, chunk_size=8, streaming=True, seed=1)
+    try:
+        yield streamed
+    finally:
+        game.level.destroy('streamed')
+        game.level.add_calls(game.map)
+
+
+def test_dirty_rects_match_full_redraw(game, terrain):
+
+    display = game.display
+    position = Vector2(game.camera.position)
+    humanoids = [
+        game.level.entities[f'humanoid-{i}'] for i in range(3)]
+    humanoid_positions = [Vector2(h.position) for h in humanoids]
+
+    try:
+        # overlapping sprites around the camera, one of them walking
+        for i, humanoid in enumerate(humanoids):
+            humanoid.position = position + Vector2(i * 0.3, i * 0.2)
+
+        display.invalidate()
+        if terrain.streaming:
+            # chunks still being generated leave gaps, they have to get
+            # filled in once they're done even with the camera still
+            terrain.stream()
+            game.frame()
+            finish_streaming(terrain)
+
+        for i in range(30):
+            if i:
+                game.camera.position += Vector2(
+                    0.37, -0.21 if i % 10 < 5 else 0.3)
+            humanoids[1].position += Vector2(0.1, 0)
+            terrain.stream()
+
+            game.frame()
+            dirty = display.screen.copy()
+
+            display.dirty_rects = False
+            game.frame()
+            display.dirty_rects = True
+
+            # a bool, pytest would diff the whole screen's bytes otherwise
+            same = (pygame.image.tostring(dirty, 'RGB') ==
+                    pygame.image.tostring(display.screen, 'RGB'))
+            assert same, f'frame {i} differs from a full redraw'
+
+            display.screen.blit(dirty, (0, 0))
+
+    finally:
+        game.camera.position = position
+        for humanoid, humanoid_position in zip(humanoids, humanoid_positions):
+            humanoid.position = humanoid_position
+        display.invalidate()
+
+def test_tile_edits_redraw_only_their_chunk(game):
+
+    display = game.display
+    _map = game.map
+    camera = game.camera.get_component(Camera)
+    original = _map.map_data.region(0, 0, _map.iso_size_x, _map.iso_size_y).copy()
+
+    try:
+        for level in range(len(ZOOM_LEVELS)):
+            camera.set_zoom_level(level)
+            display.invalidate()
+            game.frame()
+
+            cam = game.camera.position
+            x, y = int(cam.x), int(cam.y)
+            _map.set_tile(x, y, (_map.get_tile(x, y) + 7) % _map.map_delta)
+            _map.fill_tiles(x - 6, y + 2, 3, 2, 0)
+            assert not display._invalid_all
+
+            game.frame()
+            dirty = display.screen.copy()
+
+            display.dirty_rects = False
+            game.frame()
+            display.dirty_rects = True
+
+            same = (pygame.image.tostring(dirty, 'RGB') ==
+                    pygame.image.tostring(display.screen, 'RGB'))
+            assert same, f'zoom level {level} differs from a full redraw'
+
+    finally:
+        for x, y in np.argwhere(_map.map_data.region(
+                0, 0, _map.iso_size_x, _map.iso_size_y) != original).tolist():
+            _map.set_tile(x, y, int(original[x, y]))
+        camera.set_zoom_level(0)
+        display.invalidate()
+
+
+def test_swapped_sprites_get_redrawn(game):
+
+    display = game.display
+    red, blue = Surface((40, 40)), Surface((40, 40))
+    red.fill((255, 0, 0))
+    blue.fill((0, 0, 255))
+    pos = (display.size.x / 2, display.size.y / 2)
+    front, back = order_key(LAYER_UI, 1), order_key(LAYER_UI, 0)
+
+    try:
+        # same rects every frame, only which one is on top changes
+        for i in range(4):
+            display.blit(red, pos, front if i % 2 else back)
+            display.blit(blue, pos, back if i % 2 else front)
+            game.frame()
+
+            top = (255, 0, 0) if i % 2 else (0, 0, 255)
+            assert display.screen.get_at((int(pos[0]), int(pos[1])))[:3] == top
+
+    finally:
+        display.invalidate()
+
+
+class Sprite:
+
+    def __init__(self, order):
+        self.order = order
+
+    def get_order_value(self):
+        return self.order
+
+
+def test_render_queue_order(game):
+
+    display = game.display
+    a, b, c, d = (Sprite(order_key(LAYER_ENTITIES, 0)) for _ in range(4))
+    ui = Sprite(order_key(LAYER_UI))
+
+    try:
+        display.draw(ui)
+        display.draw(a)
+        display.draw(b, order_key(LAYER_ENTITIES, 5.5))
+        display.draw(c, order_key(LAYER_ENTITIES, -1e6))
+        display.draw(d)
+
+        # ties keep submission order, layers win over any depth
+        assert display._sorted() == [c, a, d, b, ui]
+
+    finally:
+        display.renderlist.clear()
+
+
+def test_zoom_levels(game):
+
+    display = game.display
+    camera = game.camera.get_component(Camera)
+    position = Vector2(game.camera.position)
+
+    try:
+        visible = []
+        for level in range(len(ZOOM_LEVELS)):
+            camera.set_zoom_level(level)
+            visible.append(len(game.map.visible_chunks(
+                camera.get_draw_delta(), display.size, camera.zoom)))
+
+            for i in range(10):
+                game.camera.position += Vector2(0.37, -0.21)
+
+                game.frame()
+                dirty = display.screen.copy()
+
+                display.dirty_rects = False
+                game.frame()
+                display.dirty_rects = True
+
+                assert (pygame.image.tostring(dirty, 'RGB') ==
+                        pygame.image.tostring(display.screen, 'RGB'))
+
+                display.screen.blit(dirty, (0, 0))
+
+        # zoomed out the same screen shows more of the map
+        assert visible == sorted(visible) and visible[0] < visible[-1]
+        assert (len(game.map.zoomed_tiles(2)) == len(game.map.tiles) and
+                game.map.zoomed_tiles(2)[0].get_size() == (16, 8))
+
+    finally:
+        camera.set_zoom_level(0)
+        game.camera.position = position
+        display.invalidate()
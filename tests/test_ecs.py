@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from isogame.ecs import (
+    Level, Entity, Component, Prototype, ComponentAlreadyAddedError, on_call)
+
+
+class Body(Component):
+
+    def __init__(self, entity, mass: float = 1):
+        super().__init__(entity)
+        self.mass = mass
+
+
+class Heavy(Body):
+    ...
+
+
+class Tag(Component):
+    ...
+
+
+def test_archetype_storage():
+
+    level = Level()
+    a = level.spawn('a')
+    b = level.spawn('b')
+
+    body_a = a.add_component(Body, 2)
+    body_b = b.add_component(Heavy, 5)
+    tag_b = b.add_component(Tag)
+
+    assert a.get_component(Body) is body_a
+    assert b.get_component(Body) is body_b
+    assert b.get_component(Tag) is tag_b
+    assert a.get_component(Tag) is None
+    assert b.components == [body_b, tag_b]
+
+    with pytest.raises(ComponentAlreadyAddedError):
+        a.add_component(Body)
+
+
+def test_query():
+
+    level = Level()
+    for i in range(10):
+        entity = level.spawn(f'e{i}')
+        entity.add_component(Heavy if i % 2 else Body, i)
+        if i % 3 == 0:
+            entity.add_component(Tag)
+
+    assert sorted(body.mass for body, in level.query(Body)) == list(range(10))
+    assert sorted(
+        body.mass for body, _ in level.query(Body, Tag)) == [0, 3, 6, 9]
+    assert sorted(body.mass for body, in level.query(Heavy)) == [1, 3, 5, 7, 9]
+
+    for entity, body in level.query(Entity, Body):
+        assert entity.get_component(Body) is body
+
+    # rows get swapped around when entities move or go away
+    level.destroy('e3')
+    level.destroy('e0')
+    level.entities['e1'].add_component(Tag)
+
+    assert sorted(
+        body.mass for body, _ in level.query(Body, Tag)) == [1, 6, 9]
+    for name, entity in level.entities.items():
+        assert entity.get_component(Body).mass == int(name[1:])
+
+
+class Counter(Component):
+
+    def __init__(self, entity, log: list):
+        super().__init__(entity)
+        self.log = log
+
+    @on_call('update')
+    def tick(self):
+        self.log.append(self.entity.name)
+
+    @on_call('draw')
+    def draw(self):
+        self.log.append('draw')
+
+
+class Quiet(Counter):
+
+    # overriding without the decorator drops the handler
+    def draw(self):
+        ...
+
+
+def test_perform_calls():
+
+    log = []
+    level = Level()
+    for name in 'abc':
+        level.spawn(name).add_component(Counter, log)
+    level.spawn('d').add_component(Quiet, log)
+
+    level.perform_calls('update')
+    level.perform_calls('draw')
+    assert log == ['a', 'b', 'c', 'd', 'draw', 'draw', 'draw']
+
+    log.clear()
+    level.destroy('b')
+    level.perform_calls('update')
+    level.perform_calls('missing')
+    assert log == ['a', 'c', 'd']
+
+
+def test_spawn_many_and_pooling():
+
+    level = Level()
+    prototype = Prototype('crowd').add(Body, 3).add(Tag)
+
+    crowd = level.spawn_many(prototype, 100)
+    assert len(level.entities) == 100
+    assert len({entity.id for entity in crowd}) == 100
+    assert all(
+        level.entities[entity.name] is entity and
+        entity.get_component(Body).mass == 3
+        for entity in crowd
+    )
+    assert sum(1 for _ in level.query(Body, Tag)) == 100
+
+    recycled = {id(entity) for entity in crowd[:40]}
+    level.destroy_many([entity.name for entity in crowd[:40]])
+    assert len(level.entities) == 60
+    assert sum(1 for _ in level.query(Body)) == 60
+
+    again = level.spawn_many(Prototype('crowd').add(Body, 7).add(Tag), 50)
+    assert len({id(entity) for entity in again} & recycled) == 40
+    assert sorted(body.mass for body, in level.query(Body)) == [3] * 60 + [7] * 50
+    assert all(entity.get_component(Body).entity is entity for entity in again)
+
+
+class Sibling(Component):
+
+    def __init__(self, entity):
+        super().__init__(entity)
+        # built by spawn_many before the entity has a row
+        self.body = entity.get_component(Body)
+        self.components = entity.components
+
+
+def test_components_see_their_siblings_while_built():
+
+    level = Level()
+    level.spawn_many(Prototype('other').add(Body).add(Sibling), 3)
+
+    built = level.spawn_many(Prototype('built').add(Body).add(Sibling), 1)[0]
+    sibling = built.get_component(Sibling)
+    assert sibling.body is built.get_component(Body)
+    assert sibling.components == [sibling.body]
+
+    # same as going through add_component
+    added = level.spawn('added')
+    added.add_component(Body)
+    assert added.add_component(Sibling).body is added.get_component(Body)
+
+    # pooled entities get them back when reused
+    level.destroy(built.name)
+    again = level.spawn_many(Prototype('built').add(Body).add(Sibling), 1)[0]
+    assert again is built
+    assert again.get_component(Sibling).body is again.get_component(Body)
+
+
+def test_entity_without_row_has_no_components():
+
+    level = Level()
+    crowd = level.spawn_many(Prototype('crowd').add(Body), 2)
+
+    # a destroyed entity sits in the pool without a row
+    level.destroy(crowd[0].name)
+    assert crowd[0].get_component(Body) is None
+    assert crowd[0].components == []
+    assert crowd[1].get_component(Body).entity is crowd[1]
+
+
+def test_spawn_many_keeps_names_free():
+
+    level = Level()
+    # named after the ids spawn_many is about to hand out
+    taken = [level.spawn(f'crowd-{i}') for i in range(5, 10)]
+    crowd = level.spawn_many(Prototype('crowd').add(Body), 5)
+
+    assert all(level.entities[entity.name] is entity for entity in taken)
+    assert all(level.entities[entity.name] is entity for entity in crowd)
+    assert len(level.entities) == 10
+
+
+class Light(Body):
+    ...
+
+
+def test_get_component_goes_by_add_order():
+
+    level = Level()
+    a = level.spawn('a')
+    a.add_component(Heavy)
+    a.add_component(Light)
+
+    # same archetype, other order
+    b = level.spawn('b')
+    b.add_component(Light)
+    b.add_component(Heavy)
+    assert a._archetype is b._archetype
+
+    assert isinstance(a.get_component(Body), Heavy)
+    assert isinstance(b.get_component(Body), Light)
+    assert [type(c) for c in b.components] == [Light, Heavy]
+
+    crowd = level.spawn_many(Prototype('crowd').add(Light).add(Heavy), 2)
+    assert all(isinstance(e.get_component(Body), Light) for e in crowd)
+
+    # exact types don't care
+    assert type(a.get_component(Light)) is Light
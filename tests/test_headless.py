@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import subprocess
+
+
+# the game is a process wide singleton, so headless runs get their own
+# process instead of sharing the session game
+SCRIPT = '''
+import json
+import pygame
+from isogame.ecs import run_headless, game_state
+
+result = run_headless(50, seed=7)
+game = game_state()
+print(json.dumps({
+    'ticks': result['ticks'],
+    'window': pygame.display.get_init(),
+    'screen': game.display.screen is not None,
+    'seed': game.map.seed,
+    'tiles': game.map.map_data.histogram().tolist()
+}))
+'''
+
+
+def run_script():
+    out = subprocess.run(
+        [sys.executable, '-c', SCRIPT],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def test_run_headless():
+
+    first = run_script()
+    assert first['ticks'] == 50
+    assert not first['window']
+    assert not first['screen']
+
+    # same seed, same world
+    assert run_script() == first
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import subprocess
+
+import pygame
+import pytest
+
+from pygame import K_a, K_d, K_q
+
+from isogame.input import (
+    Input, InputReplay, InputFormatError, HEADER, KEY, FRAME)
+
+
+def event(type, **attrs):
+    return pygame.event.Event(type, **attrs)
+
+
+def test_only_bound_keys_are_tracked():
+
+    keys = Input()
+    keys.handle(event(pygame.KEYDOWN, key=K_d))
+    keys.handle(event(pygame.KEYDOWN, key=K_q))
+    keys.handle(event(pygame.MOUSEBUTTONDOWN, button=1, pos=(10, 20)))
+    keys.update()
+
+    assert keys.is_down(K_d) and keys.was_pressed(K_d)
+    assert keys.is_action_down('right')
+    assert not keys.is_down(K_q)
+    assert keys.axis == pygame.math.Vector2(1, 0)
+    assert keys.selecting and keys.selection_begin == (10, 20)
+
+    # edges only last one frame
+    keys.handle(event(pygame.KEYUP, key=K_d))
+    keys.update()
+    assert not keys.is_down(K_d) and not keys.was_pressed(K_d)
+    assert keys.was_released(K_d) and keys.is_mouse_down(0)
+
+
+def test_record_and_replay(tmp_path):
+
+    path = str(tmp_path / 'session.input')
+
+    recorded = Input()
+    recorded.record(path, seed=42)
+    states = []
+    for i in range(10):
+        if i == 2:
+            recorded.handle(event(pygame.KEYDOWN, key=K_a))
+        if i == 6:
+            recorded.handle(event(pygame.KEYUP, key=K_a))
+        recorded.handle(event(pygame.MOUSEWHEEL, x=0, y=i % 2))
+        recorded.update(i / 100)
+        states.append((recorded.axis, recorded.wheel, recorded.was_released(K_a)))
+    recorded.close()
+
+    size = HEADER.size + len(recorded.keys) * KEY.size + 10 * FRAME.size
+    assert (tmp_path / 'session.input').stat().st_size == size
+
+    replayed = Input()
+    replay = replayed.play(path)
+    assert replay.seed == 42 and replay.frames == 10
+
+    for i in range(10):
+        # live events don't get in the way of a replay
+        replayed.handle(event(pygame.KEYDOWN, key=K_d))
+        assert replayed.update() == i / 100
+        assert (replayed.axis, replayed.wheel,
+                replayed.was_released(K_a)) == states[i]
+
+    replayed.update()
+    assert replayed.replay_done
+
+
+def test_replay_needs_same_bindings(tmp_path):
+
+    path = str(tmp_path / 'session.input')
+    recorded = Input({'jump': (K_q,)})
+    recorded.record(path)
+    recorded.update()
+    recorded.close()
+
+    with pytest.raises(InputFormatError):
+        Input().play(path)
+
+    (tmp_path / 'junk.input').write_bytes(b'not a recording at all')
+    with pytest.raises(InputFormatError):
+        InputReplay(str(tmp_path / 'junk.input'))
+
+
+# the game is a process wide singleton, every session gets its own
+# process. A component presses and releases a key from inside the loop
+# and stops the game, the replay has to walk the camera the same way.
+SCRIPT = '''
+import os, sys, json, time, random
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+import pygame
+from isogame.ecs import init_game, Component, on_call
+from isogame.input import InputReplay
+
+path, mode = sys.argv[1], sys.argv[2]
+
+class Driver(Component):
+
+    def __init__(self, entity):
+        super().__init__(entity)
+        self.ticks = 0
+        self.trace = []
+
+    @on_call('update')
+    def drive(self):
+        self.ticks += 1
+        self.trace.append(tuple(self.game.camera.position))
+        if mode == 'replay':
+            # real frames slower than the recorded ones, a frame run past
+            # the end of the recording would tick again
+            time.sleep(0.003)
+        if mode == 'record':
+            if self.ticks == 5:
+                pygame.event.post(pygame.event.Event(
+                    pygame.KEYDOWN, key=pygame.K_d))
+            if self.ticks == 40:
+                pygame.event.post(pygame.event.Event(
+                    pygame.KEYUP, key=pygame.K_d))
+            if self.ticks == 80:
+                self.game.stop()
+
+random.seed(InputReplay(path).seed if mode == 'replay' else 3)
+game = init_game(tick_rate=400, max_fps=0)
+driver = game.level.spawn('driver').add_component(Driver)
+if mode == 'replay':
+    game.input.play(path)
+else:
+    game.input.record(path, seed=3)
+game.run()
+print(json.dumps(driver.trace))
+'''
+
+
+def run_session(path, mode):
+    out = subprocess.run(
+        [sys.executable, '-c', SCRIPT, path, mode],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def test_replay_is_deterministic(tmp_path):
+
+    path = str(tmp_path / 'session.input')
+    recorded = run_session(path, 'record')
+    replayed = run_session(path, 'replay')
+
+    assert recorded[0] != recorded[-1]
+    assert replayed == recorded
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+import random
+import contextlib
+
+import numpy as np
+import pygame
+import pytest
+
+from pygame.math import Vector2
+
+from isogame.map import Map, Minimap
+from isogame.utils import diamond_cells
+from isogame.display import ZOOM_LEVELS
+
+
+@contextlib.contextmanager
+def spawn_map(game, *args, **kwargs):
+
+    entity = game.level.spawn('test-map')
+    try:
+        yield entity.add_component(Map, *args, **kwargs)
+    finally:
+        game.level.destroy('test-map')
+
+
+def tiles(_map):
+    return _map.map_data.region(0, 0, _map.iso_size_x, _map.iso_size_y).copy()
+
+
+def test_map_save_and_reopen(game, tmp_path):
+
+    path = str(tmp_path / 'saved.world')
+    with spawn_map(game, 50, 50, 64, seed=5) as generated:
+        expected = tiles(generated)
+        generated.save(path)
+        generated.world.close()
+
+    with spawn_map(game, None, None, 64, world_path=path) as loaded:
+        assert (loaded.iso_size_x, loaded.iso_size_y) == (50, 50)
+        assert loaded.seed == 5
+        assert (tiles(loaded) == expected).all()
+        loaded.world.close()
+
+
+def test_map_save_writes_back_dirty_chunks(game, tmp_path):
+
+    path = str(tmp_path / 'edited.world')
+    with spawn_map(game, 50, 50, 64, seed=5) as generated:
+        expected = tiles(generated)
+        generated.save(path)
+        generated.world.close()
+
+    # only a couple of chunks fit in memory, the rest comes from the file
+    # the map saves into
+    with spawn_map(
+            game, None, None, 64, world_path=path, max_chunks=2) as loaded:
+        loaded.set_tile(3, 4, 7)
+        loaded.fill_tiles(40, 40, 5, 5, 1)
+        assert loaded.dirty_chunks is loaded.map_data.dirty
+
+        # paged out to the world file on eviction, not dirty any more
+        loaded.get_tile(20, 0)
+        loaded.get_tile(20, 20)
+        assert not loaded.map_data.loaded(0, 0)
+        assert (0, 0) not in loaded.dirty_chunks
+
+        loaded.save()
+        assert not loaded.dirty_chunks
+
+        # saving onto its own world file is the same as saving in place
+        loaded.set_tile(20, 20, 2)
+        loaded.save(path)
+        loaded.world.close()
+
+    expected[3, 4] = 7
+    expected[40:45, 40:45] = 1
+    expected[20, 20] = 2
+
+    with spawn_map(game, None, None, 64, world_path=path) as reloaded:
+        assert (tiles(reloaded) == expected).all()
+        reloaded.world.close()
+
+
+def test_map_save_to_another_path(game, tmp_path):
+
+    first, second = str(tmp_path / 'a.world'), str(tmp_path / 'b.world')
+    with spawn_map(game, 50, 50, 64, seed=9) as generated:
+        expected = tiles(generated)
+        generated.save(first)
+        generated.world.close()
+
+    with spawn_map(
+            game, None, None, 64, world_path=first, max_chunks=2) as loaded:
+        loaded.save(second)
+        assert loaded.world.path == second
+        loaded.world.close()
+
+    for path in (first, second):
+        with spawn_map(game, None, None, 64, world_path=path) as reloaded:
+            assert (tiles(reloaded) == expected).all()
+            reloaded.world.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.world', 'b.world']
+
+
+def finish_streaming(_map):
+    for future in list(_map.map_data._pending.values()):
+        future.result()
+    _map.map_data.poll()
+
+
+def test_stream_covers_the_screen_at_every_zoom(game):
+
+    camera = game.display.camera
+    with spawn_map(
+            game, None, None, 64, chunk_size=8, streaming=True,
+            seed=1) as streamed:
+        try:
+            for level in range(len(ZOOM_LEVELS)):
+                camera.set_zoom_level(level)
+                streamed.stream()
+                finish_streaming(streamed)
+
+                visible = streamed.visible_chunks(
+                    camera.get_draw_delta(), game.display.size, camera.zoom)
+                missing = [
+                    (cx, cy) for cx, cy in visible.tolist()
+                    if not streamed.map_data.loaded(cx, cy)
+                ]
+                assert not missing, f'zoom level {level}'
+
+            # back in, what's far off screen goes again
+            camera.set_zoom_level(0)
+            streamed.stream()
+            assert len(streamed.map_data._chunks) < len(visible)
+        finally:
+            camera.set_zoom_level(0)
+
+
+def test_minimap_patches_match_a_rebuild(game):
+
+    _map = game.map
+    minimap = game.minimap.get_component(Minimap)
+    original = tiles(_map)
+    rng = random.Random(2)
+
+    def cache_bytes():
+        return pygame.image.tobytes(minimap._cache, 'RGBA')
+
+    try:
+        for scale in (1, 2.5, 3, 4):
+            minimap.set_scale(scale)
+            minimap._build_cache()
+
+            for i in range(40):
+                tile_id = rng.randrange(_map.map_delta)
+                width, height = rng.randint(1, 4), rng.randint(1, 4)
+                x = rng.randint(0, _map.iso_size_x - width)
+                y = rng.randint(0, _map.iso_size_y - height)
+                if i % 2:
+                    _map.fill_tiles(x, y, width, height, tile_id)
+                else:
+                    _map.set_tile(x, y, tile_id)
+
+                # small edits get patched in place
+                assert minimap._cache is not None
+            patched = cache_bytes()
+
+            minimap._build_cache()
+            assert patched == cache_bytes(), f'scale {scale}'
+
+    finally:
+        for x, y in np.argwhere(tiles(_map) != original).tolist():
+            _map.set_tile(x, y, int(original[x, y]))
+        minimap.set_scale(3)
+
+
+def test_diamond_cells():
+
+    cells = diamond_cells(-3, 4, -2, 5)
+    expected = sorted(
+        ((x, y)
+         for x in range(-10, 10)
+         for y in range(-10, 10)
+         if -3 <= x + y < 4 and -2 <= y - x < 5),
+        key=lambda c: (c[1] - c[0], c[0] + c[1])
+    )
+    assert [tuple(cell) for cell in cells.tolist()] == expected
+
+
+def on_screen_cells(_map, draw_delta, screen_size, cell_size, offset_y):
+    """Cells whose image rect overlaps the screen, out of every cell of a
+    box around it
+    """
+    iso = _map.cartesian_to_iso(
+        (screen_size / 2 - draw_delta) / cell_size)
+    radius = int(screen_size.x + screen_size.y) // (
+        cell_size * _map.cartesian_size // 4)
+    x, y = np.mgrid[
+        int(iso.x) - radius:int(iso.x) + radius,
+        int(iso.y) - radius:int(iso.y) + radius
+    ]
+    cells = np.stack((x.ravel(), y.ravel()), axis=1)
+    if _map.bounded:
+        x, y = cells[:, 0] * cell_size, cells[:, 1] * cell_size
+        cells = cells[
+            (x >= 0) & (x < _map.iso_size_x) &
+            (y >= 0) & (y < _map.iso_size_y)
+        ]
+
+    pos = _map.iso_to_cartesian_array(cells * cell_size) + (
+        draw_delta.x, draw_delta.y + offset_y)
+    width = cell_size * _map.tile_size.x
+    height = cell_size * _map.tile_size.y
+    on_screen = (
+        (-width < pos[:, 0]) & (pos[:, 0] < screen_size.x) &
+        (-height < pos[:, 1]) & (pos[:, 1] < screen_size.y)
+    )
+    return {tuple(cell) for cell in cells[on_screen].tolist()}
+
+
+@pytest.mark.parametrize('bounded', [True, False])
+def test_visible_cells_are_exact(game, bounded):
+
+    rng = random.Random(4)
+    size = game.display.size
+    with spawn_map(
+            game, *((50, 50) if bounded else (None, None)), 64,
+            chunk_size=8, streaming=not bounded, seed=1) as _map:
+
+        n = _map.chunk_size
+        chunk_offset = -((n - 1) * _map.cartesian_size) / 4
+        seen = 0
+        for zoom in ZOOM_LEVELS:
+            for _ in range(8):
+                # whole pixels like the camera gives, edges land exactly
+                # on the screen border now and then
+                delta = Vector2(
+                    rng.randint(-2500, 500), rng.randint(-600, 600))
+
+                tiles = _map.visible_tiles(delta, size, zoom)
+                seen += len(tiles)
+                assert {tuple(c) for c in tiles.tolist()} == on_screen_cells(
+                    _map, delta / zoom, size / zoom, 1, 0)
+                assert len(tiles) == len({tuple(c) for c in tiles.tolist()})
+
+                chunks = _map.visible_chunks(delta, size, zoom)
+                assert {tuple(c) for c in chunks.tolist()} == on_screen_cells(
+                    _map, delta / zoom, size / zoom, n, chunk_offset)
+
+        assert seen
+
+
+def test_streaming_follows_the_camera(game):
+
+    display = game.display
+    camera = game.camera
+    start = Vector2(camera.position)
+
+    # the streamed map draws in place of the session one, with its own
+    # minimap
+    game.level.remove_calls([game.map])
+    session_map = game.map
+    with spawn_map(
+            game, None, None, 64, chunk_size=8, streaming=True,
+            stream_radius=2, seed=1) as streamed:
+        game.map = streamed
+        try:
+            minimap = game.level.spawn('test-minimap').add_component(
+                Minimap, 32)
+        finally:
+            game.map = session_map
+
+        try:
+            n = streamed.chunk_size
+            first = None
+            # over chunk borders and far past the origin both ways
+            for x, y in [(4, 4), (7.5, 4), (8.5, 4), (8.5, -0.5),
+                         (-30, -20), (-300, 50), (200, 400)]:
+                camera.position = Vector2(x, y)
+                camera.prev_position = camera.position
+                ccx, ccy = int(x // n), int(y // n)
+
+                streamed.stream()
+                first = first or (ccx, ccy)
+
+                # what's around the camera is there right away, the rest
+                # of the radius is on the way
+                for cx in range(ccx - 2, ccx + 3):
+                    for cy in range(ccy - 2, ccy + 3):
+                        if max(abs(cx - ccx), abs(cy - ccy)) <= 1:
+                            assert streamed.map_data.loaded(cx, cy)
+                        else:
+                            assert (streamed.map_data.loaded(cx, cy) or
+                                    (cx, cy) in streamed.map_data._pending)
+
+                finish_streaming(streamed)
+
+                # nothing far from the camera stays loaded
+                far = [
+                    (cx, cy) for cx, cy in streamed.map_data._chunks
+                    if max(abs(cx - ccx), abs(cy - ccy)) > 8
+                ]
+                assert not far
+
+                # no holes left, nothing to redraw once it's drawn
+                display.invalidate()
+                game.frame()
+                assert not display._invalid_all and not display._invalid
+
+                assert minimap.origin == Vector2(
+                    ccx * n + n // 2 - 16, ccy * n + n // 2 - 16)
+                assert minimap._cache is not None
+
+            assert not streamed.map_data.loaded(*first)
+
+        finally:
+            game.level.destroy('test-minimap')
+            camera.position = start
+            game.level.add_calls(game.map)
+            display.invalidate()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import random
+
+import numpy as np
+
+from opensimplex import OpenSimplex
+
+from isogame.map import noise_to_tile_id
+from isogame.noise import FractalNoise
+
+
+def test_tile_ids_match_noise_to_tile_id():
+
+    seed = random.randint(0, 99999999)
+    delta = 20
+
+    simplex = OpenSimplex(seed=seed)
+    ids = FractalNoise(seed).tile_ids(-5, 3, 40, 30, delta)
+
+    assert ids.shape == (40, 30)
+    for x in range(40):
+        for y in range(30):
+            assert ids[x, y] == noise_to_tile_id(
+                simplex, x - 5, y + 3, delta)
+
+
+def test_fractal_noise_octaves():
+
+    noise = FractalNoise(1234, octaves=4, lacunarity=2.0, persistence=0.5)
+    ids = noise.tile_ids(0, 0, 64, 64, 20)
+
+    assert ids.min() >= 0 and ids.max() < 20
+
+    # boxes sampled apart line up with a single big box
+    assert np.array_equal(
+        ids[16:48, 8:40], noise.tile_ids(16, 8, 32, 32, 20))
+
+
+def test_parallel_tile_ids_deterministic():
+
+    noise = FractalNoise(4321, octaves=3)
+    ids = noise.tile_ids(3, -7, 70, 50, 20)
+
+    for workers in (1, 3):
+        assert np.array_equal(
+            ids,
+            noise.tile_ids_parallel(
+                3, -7, 70, 50, 20, workers=workers, chunk_size=16)
+        )
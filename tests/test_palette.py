@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import pygame
+
+from isogame.palette import TilePalette, tile_colors
+from isogame.utils import tint
+
+
+def test_variants_are_baked_once_and_loaded(game, tmp_path):
+
+    tile = pygame.image.load('res/tile_medium.png')
+    colors = tile_colors(20)
+
+    baked = TilePalette(tile, colors, str(tmp_path)).variants()
+    assert len(list(tmp_path.iterdir())) == 1
+
+    loaded = TilePalette(tile, colors, str(tmp_path)).variants()
+    for i, color in enumerate(colors):
+        expected = pygame.image.tostring(tint(tile, color), 'RGBA')
+        assert pygame.image.tostring(baked[i], 'RGBA') == expected
+        assert pygame.image.tostring(loaded[i], 'RGBA') == expected
+
+
+def test_palette_key_follows_tileset_and_params(game, tmp_path):
+
+    tile = pygame.image.load('res/tile_medium.png')
+    palette = TilePalette(tile, tile_colors(20), str(tmp_path))
+
+    other_tile = tile.copy()
+    other_tile.set_at((32, 16), (255, 0, 0, 255))
+
+    assert palette.key((64, 32)) != palette.key((32, 16))
+    assert palette.key((64, 32)) != TilePalette(
+        tile, tile_colors(21), str(tmp_path)).key((64, 32))
+    assert palette.key((64, 32)) != TilePalette(
+        other_tile, tile_colors(20), str(tmp_path)).key((64, 32))
+
+    small = palette.variants((32, 16))
+    assert small[0].get_size() == (32, 16)
+
+
+def test_palette_follows_a_new_tile(game, tmp_path):
+
+    tile = pygame.image.load('res/tile_medium.png')
+    palette = TilePalette(tile, tile_colors(20), str(tmp_path))
+    key = palette.key((64, 32))
+    palette.variants()
+
+    other_tile = tile.copy()
+    other_tile.set_at((32, 16), (255, 0, 0, 255))
+    palette.tile = other_tile
+
+    assert palette.key((64, 32)) != key
+    assert (pygame.image.tostring(palette.variants()[0], 'RGBA') ==
+            pygame.image.tostring(tint(other_tile, palette.colors[0]), 'RGBA'))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import json
+
+from isogame.ecs import Level, Component, on_call
+from isogame.profiler import Profiler
+
+
+class Spinner(Component):
+
+    @on_call('update')
+    def spin(self):
+        sum(range(1000))
+
+
+def test_profiler_records_handlers(tmp_path):
+
+    level = Level()
+    for i in range(3):
+        level.spawn(f's{i}').add_component(Spinner)
+
+    profiler = Profiler(window=2)
+    level.profiler = profiler
+    for _ in range(3):
+        profiler.begin_frame()
+        level.perform_calls('update')
+        profiler.end_frame()
+
+    assert len(profiler.frames) == 2
+    assert set(profiler.averages()) == {'Spinner.spin', 'update', 'frame'}
+    assert [name for name, _ in profiler.report()] == ['Spinner.spin']
+    assert profiler.averages('update')['Spinner.spin'] > 0
+
+    path = tmp_path / 'trace.json'
+    profiler.export_chrome_trace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+    # one span for the three spinners, the pass and the frame
+    assert len(events) == 2 * (1 + 2)
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+
+    # the summed span fits inside its pass
+    spin, update = (
+        next(e for e in events if e['name'] == name)
+        for name in ('Spinner.spin', 'update'))
+    assert update['ts'] <= spin['ts']
+    assert spin['ts'] + spin['dur'] <= update['ts'] + update['dur'] + 1e-3
+
+
+def test_profiler_overlay(game):
+
+    game.profile(overlay=True)
+    try:
+        for _ in range(3):
+            game.profiler.begin_frame()
+            game.frame()
+            game.profiler.end_frame()
+
+        names = set(game.profiler.averages('raw_draw'))
+        assert {'Map.raw_draw', 'ProfilerOverlay.raw_draw'} <= names
+
+    finally:
+        game.profile(False)
+        game.profiler.clear()
+
+    assert 'profiler' not in game.level.entities
+
+
+def test_profiler_window_over_ticks(game):
+
+    game.profile()
+    try:
+        game.run_ticks(game.profiler.window + 30)
+
+        # spans don't pile up without frames
+        assert len(game.profiler.frames) == game.profiler.window
+        assert not game.profiler._frame
+        assert 'update' in game.profiler.averages()
+
+    finally:
+        game.profile(False)
+        game.profiler.clear()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import random
+
+from pygame.math import Vector2
+
+from isogame.ecs import Level
+
+
+def spread(level, amount, seed=0):
+    rng = random.Random(seed)
+    entities = []
+    for i in range(amount):
+        entity = level.spawn(f'e{i}')
+        entity.position = Vector2(rng.uniform(-50, 50), rng.uniform(-50, 50))
+        entities.append(entity)
+    return entities
+
+
+def test_spatial_queries_match_brute_force():
+
+    level = Level()
+    entities = spread(level, 500)
+    index = level.index
+
+    def names(found):
+        return sorted(entity.name for entity in found)
+
+    assert names(index.region(-10, 5, 20, 30)) == names(
+        e for e in entities
+        if -10 <= e.position.x < 10 and 5 <= e.position.y < 35)
+
+    center = Vector2(3, -7)
+    assert names(index.radius(center, 12.5)) == names(
+        e for e in entities if e.position.distance_to(center) <= 12.5)
+
+    assert names(index.diamond(-20, 30, -15, 10)) == names(
+        e for e in entities
+        if -20 <= e.position.x + e.position.y < 30 and
+        -15 <= e.position.y - e.position.x < 10)
+
+
+def test_spatial_index_follows_entities():
+
+    level = Level()
+    a, b = spread(level, 2)
+
+    a.position = Vector2(100, 100)
+    b.position += Vector2(1000, 0) - b.position
+    assert level.index.region(99, 99, 2, 2) == [a]
+    assert level.index.radius(Vector2(1000, 0), 0.5) == [b]
+
+    level.destroy(a.name)
+    assert level.index.region(99, 99, 2, 2) == []
+    assert a not in level.index and len(level.index) == 1
+
+
+def test_in_place_changes_dont_lose_entities():
+
+    level = Level()
+    entity = level.spawn('e')
+    entity.position = Vector2(3, 3)
+
+    # the getter hands out a copy, only assigning moves the entity
+    entity.position.x += 500
+    entity.position.update(300, 300)
+    assert entity.position == Vector2(3, 3)
+    assert level.index.radius(Vector2(3, 3), 1) == [entity]
+
+    moved = entity.position
+    moved.x += 500
+    entity.position = moved
+    moved.y += 500
+    assert entity.position == Vector2(503, 3)
+    assert level.index.radius(Vector2(503, 3), 1) == [entity]
+    assert level.index.radius(Vector2(3, 3), 1) == []
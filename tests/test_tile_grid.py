@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from isogame.tiles import TileGrid, ChunkedTiles, ChunkPager
+
+
+def test_tile_grid_dtype():
+
+    assert TileGrid(4, 4, 20).data.dtype == np.uint8
+    assert TileGrid(4, 4, 256).data.dtype == np.uint8
+    assert TileGrid(4, 4, 257).data.dtype == np.uint16
+
+
+def test_tile_grid_access():
+
+    grid = TileGrid(8, 6, 20)
+
+    grid.set(7, 5, 3)
+    assert grid.get(7, 5) == 3
+    assert grid[7][5] == 3
+    assert grid[7, 5] == 3
+    assert grid.shape == (8, 6)
+
+
+def test_tile_grid_bulk_ops():
+
+    grid = TileGrid(8, 8, 20)
+
+    grid.fill(2, 2, 3, 3, 5)
+    grid.fill(-2, -2, 3, 3, 7)  # clipped to the top left 1x1
+
+    assert grid.count(5) == 9
+    assert grid.count(7) == 1
+    assert grid.mask(5).sum() == 9
+    assert grid.mask_range(5, 8).sum() == 10
+    assert (grid.region(2, 2, 3, 3) == 5).all()
+    assert grid.region(6, 6, 10, 10).shape == (2, 2)
+
+    hist = grid.histogram()
+    assert len(hist) == 20
+    assert hist[0] == 64 - 10
+
+
+def _coords_chunk(cx, cy):
+    # every tile id encodes its own coords, mod 256
+    x, y = np.meshgrid(
+        np.arange(cx * 4, cx * 4 + 4),
+        np.arange(cy * 4, cy * 4 + 4),
+        indexing='ij'
+    )
+    return (x * 16 + y) % 256
+
+
+def test_chunked_tiles_region():
+
+    tiles = ChunkedTiles(4, 256, _coords_chunk)
+
+    region = tiles.region(-3, 2, 9, 7)
+    assert region.shape == (9, 7)
+    assert region[0, 0] == (-3 * 16 + 2) % 256
+    assert region[8, 6] == (5 * 16 + 8) % 256
+    assert tiles.get(-3, 2) == region[0, 0]
+
+    bounded = ChunkedTiles(4, 256, _coords_chunk, size_x=10, size_y=10)
+    assert bounded.region(-3, 8, 5, 5).shape == (2, 2)
+
+
+def test_chunked_tiles_eviction_and_paging(tmp_path):
+
+    tiles = ChunkedTiles(
+        4, 256, _coords_chunk,
+        max_chunks=2,
+        pager=ChunkPager(str(tmp_path))
+    )
+
+    tiles.set(1, 1, 200)
+    tiles.get(5, 1)
+    tiles.get(9, 1)  # over max_chunks, evicts the modified chunk
+
+    assert not tiles.loaded(0, 0)
+    assert len(tiles) == 2
+    assert tiles.get(1, 1) == 200
+
+    tiles.evict_outside(0, 0, 1, 1)
+    assert len(tiles) == 1 and tiles.loaded(0, 0)
+
+
+def test_chunked_tiles_keep_edits_without_pager():
+
+    tiles = ChunkedTiles(4, 256, _coords_chunk, max_chunks=2)
+
+    tiles.set(1, 1, 200)
+    tiles.fill(4, 0, 2, 2, 100)
+    for cx in range(2, 6):
+        tiles.get(cx * 4, 1)
+    tiles.evict_outside(5, 0, 6, 1)
+
+    # nowhere to page them out to, the edited chunks stay
+    assert tiles.loaded(0, 0) and tiles.loaded(1, 0)
+    assert tiles.get(1, 1) == 200 and tiles.get(5, 1) == 100
+    assert len(tiles) == 3
+
+    tiles.flush()
+    assert tiles.dirty == {(0, 0), (1, 0)}
+
+
+def test_chunked_tiles_background_request():
+
+    tiles = ChunkedTiles(4, 256, _coords_chunk)
+
+    tiles.request(2, 3)
+    tiles._pending[(2, 3)].result()
+    tiles.poll()
+
+    assert tiles.loaded(2, 3)
+    assert np.array_equal(tiles.chunk(2, 3), _coords_chunk(2, 3))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from pygame.math import Vector2
+
+from isogame.ecs import Level
+from isogame.timing import FrameStats
+
+
+def test_frame_stats_window():
+
+    stats = FrameStats(window=4)
+    for _ in range(10):
+        stats.record(0.02, 0.005, 2)
+    stats.record(0.01, 0.01, 0)
+
+    assert stats.frames == 11
+    assert stats.ticks == 20
+    assert stats.frame_ms == pytest.approx((3 * 20 + 10) / 4)
+    assert stats.work_ms == pytest.approx((3 * 5 + 10) / 4)
+    assert stats.max_work_ms == pytest.approx(10)
+    assert stats.tick_rate == pytest.approx(6 / 0.07)
+
+
+def test_lerp_position():
+
+    entity = Level().spawn('e')
+    entity.prev_position = Vector2(0, 2)
+    entity.position = Vector2(4, 2)
+
+    assert entity.lerp_position(0.25) == Vector2(1, 2)
+    assert entity.lerp_position(1) == entity.position
+
+
+def test_prev_position_is_kept_for_moving_entities():
+
+    level = Level()
+    moving = level.spawn('moving')
+    still = level.spawn('still')
+    still.position = Vector2(3, 3)
+    moving.position = Vector2(1, 1)
+
+    # what Game.tick does
+    level.ticks += 1
+    moving.position += Vector2(1, 0)
+    assert moving.prev_position == Vector2(1, 1)
+    assert moving.lerp_position(0.5) == Vector2(1.5, 1)
+    assert still.prev_position == still.position
+
+    # a tick it stands still in leaves it at rest
+    level.ticks += 1
+    assert moving.prev_position == moving.position == Vector2(2, 1)
+    assert moving.lerp_position(0.5) == Vector2(2, 1)
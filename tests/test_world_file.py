@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from isogame.tiles import ChunkedTiles
+from isogame.world import WorldFile, WorldFormatError
+
+
+def test_world_file_roundtrip(tmp_path):
+
+    path = str(tmp_path / 'test.world')
+
+    with WorldFile.create(path, 1234, 20, 10, 20, 8) as world:
+        assert (world.chunks_x, world.chunks_y) == (3, 2)
+
+        # clipped edge chunk
+        world.write_chunk(2, 1, np.full((4, 2), 7, dtype=np.uint8))
+
+    with WorldFile(path, writable=False) as world:
+        assert world.seed == 1234
+        assert (world.size_x, world.size_y) == (20, 10)
+        assert world.delta == 20
+        assert world.chunk_size == 8
+
+        chunk = world.read_chunk(2, 1)
+        assert chunk.shape == (8, 8)
+        assert (chunk[:4, :2] == 7).all()
+        assert chunk.sum() == 7 * 8
+        assert world.read_chunk(0, 0).sum() == 0
+        del chunk
+
+        with pytest.raises(IndexError):
+            world.read_chunk(3, 0)
+
+
+def test_world_file_bad_magic(tmp_path):
+
+    path = tmp_path / 'bad.world'
+    path.write_bytes(b'\x00' * 128)
+
+    with pytest.raises(WorldFormatError):
+        WorldFile(str(path))
+
+
+def test_world_file_as_pager(tmp_path):
+
+    path = str(tmp_path / 'paged.world')
+    world = WorldFile.create(path, 0, 32, 32, 20, 8)
+
+    def generate(cx, cy):
+        raise AssertionError('chunks should come from the world file')
+
+    tiles = ChunkedTiles(
+        8, 20, generate, size_x=32, size_y=32, max_chunks=1, pager=world)
+
+    tiles.set(1, 1, 5)
+    tiles.get(9, 1)  # evicts the dirty chunk back to the file
+
+    assert world.read_chunk(0, 0)[1, 1] == 5
+    assert tiles.get(1, 1) == 5
+    world.close()
+
+
+def test_world_file_close_with_views(tmp_path):
+
+    world = WorldFile.create(str(tmp_path / 'viewed.world'), 0, 16, 16, 20, 8)
+    view = world.read_chunk(1, 1)
+    copy = world.load(1, 1)
+
+    # views point into the mapping, it stays open while they're around
+    with pytest.raises(BufferError):
+        world.close()
+
+    del view
+    world.close()
+    assert copy.shape == (8, 8)